@@ -0,0 +1,150 @@
+import fitz
+from PIL import Image
+import io
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import tempfile
+import argparse
+import subprocess
+import engine
+from renderer import render_page
+
+CORPORA = ("text", "images", "mixed")
+PAGE_SIZES = [(595.28, 841.89), (612.0, 792.0), (841.89, 1190.55), (419.53, 595.28), (841.89, 595.28)]
+LOREM = ("Lorem ipsum dolor sit amet, consectetur adipiscing elit, sed do eiusmod tempor incididunt ut labore et dolore magna aliqua. "
+         "Ut enim ad minim veniam, quis nostrud exercitation ullamco laboris nisi ut aliquip ex ea commodo consequat. ") * 12
+UNIQUE_IMAGES = 64
+
+def make_image(n, width=1400, height=1000):
+    gradient = Image.linear_gradient("L").resize((width, height)).rotate(n * 37 % 360)
+    noise = Image.effect_noise((width, height), 40 + n % 30)
+    img = Image.merge("RGB", (gradient, noise, Image.blend(gradient, noise, 0.5)))
+    buf = io.BytesIO()
+    img.save(buf, format="JPEG", quality=90)
+    return buf.getvalue()
+
+def make_corpus(kind, pages, path):
+    doc, xrefs = fitz.open(), []
+    for n in range(pages):
+        w, h = PAGE_SIZES[n % len(PAGE_SIZES)] if kind == "mixed" else PAGE_SIZES[0]
+        page = doc.new_page(width=w, height=h)
+        if kind != "images":
+            page.insert_textbox(fitz.Rect(36, 36, w - 36, h - 36), f"Page {n + 1}\n\n{LOREM}", fontsize=9)
+        if kind == "images" or (kind == "mixed" and n % 3 == 0):
+            rect = fitz.Rect(36, 36, w - 36, h - 36) if kind == "images" else fitz.Rect(w / 4, h / 2, w * 3 / 4, h - 36)
+            if len(xrefs) < UNIQUE_IMAGES: xrefs.append(page.insert_image(rect, stream=make_image(n)))
+            else: page.insert_image(rect, xref=xrefs[n % UNIQUE_IMAGES])
+    doc.save(path, garbage=3, deflate=True)
+    doc.close()
+
+def timed(timings, name, func):
+    start = time.perf_counter()
+    result = func()
+    timings[name] = round(time.perf_counter() - start, 4)
+    return result
+
+def open_doc(paths, workers):
+    vdoc = engine.VirtualDocument()
+    vdoc.add_files(paths, workers=workers)
+    return vdoc
+
+def save_assembled(vdoc, path, compress=None, workers=1):
+    out = engine.assemble(vdoc, list(range(len(vdoc))))
+    if compress: engine.compress_images(out, compress["quality"], compress["max_res"], workers=workers)
+    engine.save_pdf(out, path)
+    out.close()
+    return os.path.getsize(path)
+
+def save_booklet(vdoc, path, sheets_per_sig=None, workers=1):
+    out = engine.make_booklet(vdoc, list(range(len(vdoc))), "A4", "LTR", sheets_per_sig, path if sheets_per_sig else None, workers=workers)
+    engine.save_pdf(out, path)
+    out.close()
+    return os.path.getsize(path)
+
+def run_corpus(kind, pages, work_dir, args):
+    timings, sizes = {}, {}
+    source = os.path.join(work_dir, f"{kind}_{pages}.pdf")
+    timed(timings, "generate", lambda: make_corpus(kind, pages, source))
+    sizes["source"] = os.path.getsize(source)
+
+    timed(timings, "open", lambda: open_doc([source], 1).close())
+    vdoc = timed(timings, "merge_open", lambda: open_doc([source, source], args.workers))
+    sizes["merge"] = timed(timings, "merge_save", lambda: save_assembled(vdoc, os.path.join(work_dir, "merge.pdf")))
+    vdoc.close()
+
+    vdoc = open_doc([source], 1)
+    sample = range(min(pages, args.render_pages))
+    for zoom in args.zooms:
+        timed(timings, f"render_{zoom}", lambda: [render_page(source, n, 0, zoom) for n in sample])
+    timings["render_pages"] = len(sample)
+
+    sizes["lossless"] = timed(timings, "save_lossless", lambda: save_assembled(vdoc, os.path.join(work_dir, "lossless.pdf")))
+    vdoc.rotate(0, 90)
+    timed(timings, "save_incremental", lambda: engine.save_incremental(vdoc, list(range(len(vdoc))), os.path.join(work_dir, "incremental.pdf")))
+    sizes["incremental"] = os.path.getsize(os.path.join(work_dir, "incremental.pdf"))
+    vdoc.rotate(0, -90)
+    compress = {"quality": 70, "max_res": 1200}
+    sizes["compressed"] = timed(timings, "save_compressed", lambda: save_assembled(vdoc, os.path.join(work_dir, "compressed.pdf"), compress, args.workers))
+
+    sizes["booklet"] = timed(timings, "booklet", lambda: save_booklet(vdoc, os.path.join(work_dir, "booklet.pdf")))
+    sizes["booklet_signatures"] = timed(timings, "booklet_signatures",
+                                        lambda: save_booklet(vdoc, os.path.join(work_dir, "signatures.pdf"), args.sheets, args.workers))
+    vdoc.close()
+    for name in os.listdir(work_dir):
+        if name != os.path.basename(source): os.remove(os.path.join(work_dir, name))
+    if not args.keep: os.remove(source)
+    return {"corpus": kind, "pages": pages, "timings": timings, "bytes": sizes}
+
+def startup_time(work_dir, repeat=3):
+    env = dict(os.environ, APPDATA=os.path.join(work_dir, "appdata"))
+    code = "import time; t = time.perf_counter(); import rePagePDF; print(time.perf_counter() - t, 'fitz' in __import__('sys').modules)"
+    runs = [subprocess.run([sys.executable, "-c", code], cwd=os.path.dirname(os.path.abspath(__file__)), env=env,
+                           capture_output=True, text=True, check=True).stdout.split() for _ in range(repeat)]
+    return {"import_gui": round(min(float(seconds) for seconds, _ in runs), 4), "fitz_loaded": runs[0][1] == "True"}
+
+def environment():
+    return {"python": platform.python_version(), "pymupdf": fitz.VersionBind, "platform": platform.platform(),
+            "cpus": os.cpu_count(), "time": time.strftime("%Y-%m-%dT%H:%M:%S")}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="benchmark.py", description="Time load, render, save, compress and booklet on synthetic PDFs.")
+    parser.add_argument("--corpus", default=",".join(CORPORA), help="comma-separated corpora: %(default)s")
+    parser.add_argument("--pages", default="10,100,1000", help="comma-separated page counts, up to 10000 (default: %(default)s)")
+    parser.add_argument("--zooms", default="0.1,0.2,0.4", help="thumbnail zoom levels to render (default: %(default)s)")
+    parser.add_argument("--render-pages", type=int, default=50, help="pages rendered per zoom level (default: %(default)s)")
+    parser.add_argument("--sheets", type=int, default=10, help="sheets per signature for the split booklet (default: %(default)s)")
+    parser.add_argument("--workers", type=int, default=engine.default_workers(), help="processes for loading, compression and signatures (default: %(default)s)")
+    parser.add_argument("--dir", help="keep the corpus in this directory instead of a temporary one")
+    parser.add_argument("--keep", action="store_true", help="do not delete generated corpus files")
+    parser.add_argument("-o", "--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args(argv)
+    args.zooms = [float(z) for z in args.zooms.split(",")]
+    kinds = [k for k in args.corpus.split(",") if k]
+    if any(k not in CORPORA for k in kinds): parser.error(f"corpus must be one of {', '.join(CORPORA)}")
+    counts = [int(p) for p in args.pages.split(",") if p]
+    if any(not 1 <= p <= 10000 for p in counts): parser.error("page counts must be between 1 and 10000")
+
+    work_dir = args.dir or tempfile.mkdtemp(prefix="rePagePDF_bench_")
+    os.makedirs(work_dir, exist_ok=True)
+    report = {"environment": environment(), "runs": []}
+    try:
+        report["startup"] = startup_time(work_dir)
+        for kind in kinds:
+            for pages in counts:
+                print(f"{kind} x {pages}...", file=sys.stderr)
+                report["runs"].append(run_corpus(kind, pages, work_dir, args))
+    finally:
+        if not args.dir: shutil.rmtree(work_dir, ignore_errors=True)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f: f.write(text + "\n")
+    else: print(text)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,150 @@
+import sys
+import tkinter as tk
+import weakref
+import customtkinter as ctk
+from PIL import ImageTk
+
+class CanvasCell:
+    def __init__(self, grid):
+        self.owner = grid
+        canvas = grid.canvas
+        self.items = (canvas.create_rectangle(0, 0, 0, 0, width=0, outline="", fill=""),
+                      canvas.create_image(0, 0, anchor="n"),
+                      canvas.create_text(0, 0, anchor="n", font=("Arial", 12), fill=grid.text_color))
+        self.image, self.text = None, ""
+        self.width, self.height = 0, 0
+        self.fg_color, self.border_color, self.border_width = "transparent", "orange", 0
+        self.row, self.column = None, None
+
+    def configure(self, image=None, text=None, width=None, height=None, fg_color=None, border_color=None, border_width=None):
+        if image is not None: self.image = image
+        if text is not None: self.text = text
+        if width is not None: self.width = width
+        if height is not None: self.height = height
+        if fg_color is not None: self.fg_color = fg_color
+        if border_color is not None: self.border_color = border_color
+        if border_width is not None: self.border_width = border_width
+        self.draw()
+
+    def grid(self, row=None, column=None, **kwargs):
+        if row is not None: self.row = row
+        if column is not None: self.column = column
+        self.draw()
+
+    def grid_forget(self):
+        self.row = self.column = None
+        for item in self.items: self.owner.canvas.itemconfigure(item, state="hidden")
+
+    def destroy(self):
+        for item in self.items: self.owner.canvas.delete(item)
+        self.owner.cells.remove(self)
+
+    def draw(self):
+        if self.row is None: return
+        canvas, (frame, image, text) = self.owner.canvas, self.items
+        x = (self.column + 0.5) * self.owner.cell_width
+        y = self.row * self.owner.row_height + 10
+        img_h = self.image.cget("size")[1] if self.image is not None else 0
+        canvas.coords(frame, x - self.width / 2, y, x + self.width / 2, y + self.height)
+        canvas.itemconfigure(frame, state="normal", width=self.border_width,
+                             outline=self.border_color if self.border_width else "", fill="" if self.fg_color == "transparent" else self.fg_color)
+        canvas.coords(image, x, y + 4)
+        canvas.itemconfigure(image, state="normal", image=self.owner.photo(self.image) if self.image is not None else "")
+        canvas.coords(text, x, y + img_h + 8)
+        canvas.itemconfigure(text, state="normal", text=self.text)
+
+class WindowCell:
+    def __init__(self, grid, widget):
+        self.owner, self.widget = grid, widget
+        self.item = grid.canvas.create_window(0, 0, anchor="n", window=widget, state="hidden")
+        self.row, self.column = None, None
+        grid.bind_wheel(widget)
+
+    def configure(self, **kwargs):
+        self.widget.configure(**kwargs)
+
+    def bind(self, sequence, command):
+        self.widget.bind(sequence, command)
+
+    def grid(self, row=None, column=None, **kwargs):
+        if row is not None: self.row = row
+        if column is not None: self.column = column
+        self.draw()
+
+    def grid_forget(self):
+        self.row = self.column = None
+        self.owner.canvas.itemconfigure(self.item, state="hidden")
+
+    def destroy(self):
+        self.owner.canvas.delete(self.item)
+        self.widget.destroy()
+        self.owner.cells.remove(self)
+
+    def draw(self):
+        if self.row is None: return
+        self.owner.canvas.coords(self.item, (self.column + 0.5) * self.owner.cell_width, self.row * self.owner.row_height + 10)
+        self.owner.canvas.itemconfigure(self.item, state="normal")
+
+class ThumbnailCanvas(ctk.CTkFrame):
+    def __init__(self, master, on_press=None, on_motion=None, on_release=None, **kwargs):
+        super().__init__(master, **kwargs)
+        self.grid_rowconfigure(0, weight=1)
+        self.grid_columnconfigure(0, weight=1)
+        self.canvas = tk.Canvas(self, highlightthickness=0, borderwidth=0)
+        self.canvas.grid(row=0, column=0, sticky="nsew")
+        self.scrollbar = ctk.CTkScrollbar(self, command=self.canvas.yview)
+        self.scrollbar.grid(row=0, column=1, sticky="ns")
+        self.canvas.configure(yscrollincrement=1 if sys.platform.startswith("win") else 8 if sys.platform == "darwin" else 30)
+        self.cell_width, self.row_height, self.cols, self.rows = 1, 1, 1, 0
+        self.photos = weakref.WeakKeyDictionary()
+        self.cells = []
+        self.text_color = None
+        self.apply_colors()
+
+        if on_press:
+            self.canvas.bind("<Button-1>", on_press)
+            self.canvas.bind("<B1-Motion>", on_motion)
+            self.canvas.bind("<ButtonRelease-1>", on_release)
+        self.bind_wheel(self.canvas)
+        self.canvas.bind("<Configure>", lambda e: self.layout(self.cols, self.rows))
+
+    def bind_wheel(self, widget):
+        if sys.platform.startswith("linux"):
+            widget.bind("<Button-4>", lambda e: self.canvas.yview_scroll(-1, "units"))
+            widget.bind("<Button-5>", lambda e: self.canvas.yview_scroll(1, "units"))
+        else:
+            widget.bind("<MouseWheel>", lambda e: self.canvas.yview_scroll(-int(e.delta / 6) if sys.platform.startswith("win") else -e.delta, "units"))
+
+    def apply_colors(self):
+        self.canvas.configure(bg=self._apply_appearance_mode(self.cget("fg_color")))
+        self.text_color = self._apply_appearance_mode(ctk.ThemeManager.theme["CTkLabel"]["text_color"])
+        for item in self.canvas.find_all():
+            if self.canvas.type(item) == "text": self.canvas.itemconfigure(item, fill=self.text_color)
+
+    def _set_appearance_mode(self, mode_string):
+        super()._set_appearance_mode(mode_string)
+        self.apply_colors()
+
+    def photo(self, ctk_img):
+        photo = self.photos.get(ctk_img)
+        if photo is None:
+            img, size = ctk_img.cget("light_image"), ctk_img.cget("size")
+            photo = self.photos[ctk_img] = ImageTk.PhotoImage(img if img.size == tuple(size) else img.resize(size))
+        return photo
+
+    def cell(self, widget=None):
+        self.cells.append(CanvasCell(self) if widget is None else WindowCell(self, widget))
+        return self.cells[-1]
+
+    def layout(self, cols, rows, row_height=None):
+        geometry = (self.cell_width, self.row_height)
+        if row_height is not None: self.row_height = row_height
+        self.cols, self.rows = cols, rows
+        width = self.canvas.winfo_width()
+        self.cell_width = max(1, (width if width >= 100 else 800) // cols)
+        self.canvas.configure(scrollregion=(0, 0, self.cell_width * cols, max(1, rows * self.row_height)))
+        if (self.cell_width, self.row_height) != geometry:
+            for cell in self.cells: cell.draw()
+
+    def grid_location(self, x, y):
+        return int(x // self.cell_width), int(y // self.row_height)
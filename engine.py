@@ -0,0 +1,634 @@
+import fitz
+from PIL import Image
+import io
+import os
+import re
+import shutil
+import tempfile
+import zipfile
+import sys
+import math
+import time
+import argparse
+import tracing
+from collections import OrderedDict
+from contextlib import contextmanager
+from pagetable import PageTable
+from concurrent.futures import ProcessPoolExecutor, wait, as_completed, FIRST_COMPLETED
+
+SHEET_SIZES = {"A3": (1190.55, 841.89), "A4": (841.89, 595.28), "A5": (595.28, 419.53), "Letter": (792.0, 612.0), "Legal": (1008.0, 612.0)}
+SHEET_RE = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*[xX×]\s*(\d+(?:\.\d+)?)\s*(?:mm)?\s*$")
+SPEC_RE = re.compile(r"^(\d+(-\d*)?|r-?\d+)(,(\d+(-\d*)?|r-?\d+))*$")
+INCREMENTAL_MIN_KEPT = 0.9
+ARCHIVE_DECODED_LIMIT = 16
+ARCHIVE_IMAGE_EXTS = (".jpg", ".jpeg", ".png", ".bmp", ".gif", ".tif", ".tiff", ".webp")
+PILLOW_IMAGE_EXTS = (".webp",)
+
+_worker_sources = {}
+
+def jpeg_doc(path, data=None):
+    try:
+        with Image.open(path if data is None else io.BytesIO(data)) as img:
+            if img.format != "JPEG" or img.getexif().get(0x0112, 1) != 1: return None
+            (width, height), dpi = img.size, img.info.get("dpi", (96, 96))
+    except Exception: return None
+    doc = fitz.open()
+    page = doc.new_page(width=width * 72 / (dpi[0] or 96), height=height * 72 / (dpi[1] or 96))
+    if data is None:
+        with open(path, "rb") as f: data = f.read()
+    page.insert_image(page.rect, stream=data, keep_proportion=False)
+    return doc
+
+def image_size(f):
+    try:
+        with Image.open(f) as img: (width, height), dpi = img.size, img.info.get("dpi", (96, 96))
+    except Exception: return None
+    return width * 72 / (dpi[0] or 96), height * 72 / (dpi[1] or 96)
+
+def embed_jpeg(path):
+    doc = jpeg_doc(path)
+    if doc is None: return None
+    pdf_bytes = doc.tobytes()
+    doc.close()
+    return pdf_bytes
+
+def image_doc(name, data):
+    doc = jpeg_doc(name, data)
+    if doc is not None: return doc
+    filetype = os.path.splitext(name)[1][1:]
+    if name.lower().endswith(PILLOW_IMAGE_EXTS):
+        buf = io.BytesIO()
+        with Image.open(io.BytesIO(data)) as img: img.save(buf, format="PNG")
+        data, filetype = buf.getvalue(), "png"
+    with fitz.open(stream=data, filetype=filetype) as img: return fitz.open("pdf", img.convert_to_pdf())
+
+def file_stat(path):
+    st = os.stat(path)
+    return st.st_size, st.st_mtime_ns
+
+def natural_key(name):
+    return [int(part) if part.isdigit() else part.lower() for part in re.split(r"(\d+)", name)]
+
+def open_archive(path):
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".cbz": return zipfile.ZipFile(path)
+    if ext != ".cbr": return None
+    try: import rarfile
+    except ImportError: return None
+    return rarfile.RarFile(path)
+
+def archive_members(archive):
+    names = [name for name in archive.namelist()
+             if name.lower().endswith(ARCHIVE_IMAGE_EXTS) and not name.startswith("__MACOSX/")]
+    if not names: raise Exception("No images in archive")
+    return sorted(names, key=natural_key)
+
+def prepare_source(path, temp_dir=None):
+    archive = open_archive(path)
+    if archive is not None:
+        with archive: members = archive_members(archive)
+        return path, len(members), None, members
+    pdf_bytes = embed_jpeg(path)
+    if pdf_bytes is None:
+        with fitz.open(path) as doc:
+            if doc.is_pdf: return path, len(doc), None, None
+            pdf_bytes = doc.convert_to_pdf()
+    with fitz.open("pdf", pdf_bytes) as doc: page_count = len(doc)
+    if temp_dir is None: return None, page_count, pdf_bytes, None
+    fd, out_path = tempfile.mkstemp(suffix=".pdf", dir=temp_dir)
+    with os.fdopen(fd, "wb") as f: f.write(pdf_bytes)
+    return out_path, page_count, None, None
+
+def prepare_sources(paths, temp_dir=None, progress=None, workers=None):
+    if workers is None: workers = default_workers()
+    results, done = [None] * len(paths), 0
+
+    def finish(i, prepare):
+        nonlocal done
+        try: results[i] = (prepare(), None)
+        except Exception as e: results[i] = (None, e)
+        done += 1
+        if progress: progress(done, len(paths))
+
+    if workers <= 1 or len(paths) < 2:
+        for i, path in enumerate(paths): finish(i, lambda: prepare_source(path, temp_dir))
+        return results
+
+    with ProcessPoolExecutor(max_workers=min(workers, len(paths))) as pool:
+        futures = {pool.submit(prepare_source, path, temp_dir): i for i, path in enumerate(paths)}
+        try:
+            for future in as_completed(futures): finish(futures[future], future.result)
+        except BaseException:
+            for future in futures: future.cancel()
+            raise
+    return results
+
+class Source:
+    def __init__(self, path, page_count, doc=None):
+        self.path = path
+        self.page_count = page_count
+        self.doc = doc
+        self.stat = None
+
+    def open(self):
+        if self.doc is None: self.doc, self.stat = fitz.open(self.path), file_stat(self.path)
+        return self.doc
+
+    def unchanged(self):
+        try: return self.stat is not None and file_stat(self.path) == self.stat
+        except OSError: return False
+
+    def locate(self, pno):
+        return self.open(), pno
+
+    def size(self, pno):
+        doc, pno = self.locate(pno)
+        rect = doc[pno].rect
+        return rect.width, rect.height
+
+    def close(self):
+        if self.doc is not None: self.doc.close()
+        self.doc, self.stat = None, None
+
+class ArchiveSource(Source):
+    def __init__(self, path, members):
+        super().__init__(path, len(members))
+        self.members = members
+        self.archive = None
+        self.decoded = OrderedDict()
+
+    def locate(self, pno):
+        if pno in self.decoded: self.decoded.move_to_end(pno)
+        else:
+            if self.archive is None: self.archive = open_archive(self.path)
+            name = self.members[pno]
+            self.decoded[pno] = image_doc(name, self.archive.read(name))
+            while len(self.decoded) > ARCHIVE_DECODED_LIMIT: self.decoded.popitem(last=False)[1].close()
+        return self.decoded[pno], 0
+
+    def size(self, pno):
+        if pno not in self.decoded:
+            if self.archive is None: self.archive = open_archive(self.path)
+            with self.archive.open(self.members[pno]) as f: size = image_size(f)
+            if size is not None: return size
+        return super().size(pno)
+
+    def close(self):
+        for doc in self.decoded.values(): doc.close()
+        if self.archive is not None: self.archive.close()
+        self.archive, self.decoded = None, OrderedDict()
+
+def open_source(path):
+    archive = open_archive(path)
+    if archive is None: return Source(path, None)
+    with archive: return ArchiveSource(path, archive_members(archive))
+
+class VirtualDocument:
+    def __init__(self):
+        self.sources = []
+        self.pages = PageTable()
+        self.sizes = {}
+
+    def __len__(self):
+        return len(self.pages)
+
+    def add_source(self, path, page_count, pdf_bytes=None, members=None):
+        if members is not None: self.sources.append(ArchiveSource(path, members))
+        else: self.sources.append(Source(path, page_count, None if pdf_bytes is None else fitz.open("pdf", pdf_bytes)))
+        return len(self.sources) - 1
+
+    def add_pages(self, source_id, page_nos, rotation=0):
+        return list(self.pages.extend(source_id, page_nos, rotation))
+
+    def add_files(self, paths, temp_dir=None, progress=None, workers=None):
+        page_ids, errors = [], []
+        with tracing.span("load", files=len(paths), workers=workers) as info:
+            for path, (prepared, error) in zip(paths, prepare_sources(paths, temp_dir, progress, workers)):
+                if error is not None:
+                    errors.append((path, error))
+                    continue
+                sid = self.add_source(*prepared)
+                page_ids.extend(self.add_pages(sid, range(self.sources[sid].page_count)))
+            info.update(pages=len(page_ids), errors=len(errors))
+        return page_ids, errors
+
+    def rotate(self, page_id, angle):
+        self.pages.rotate([page_id], angle)
+
+    def source_size(self, sid, pno):
+        if (sid, pno) not in self.sizes: self.sizes[sid, pno] = self.sources[sid].size(pno)
+        return self.sizes[sid, pno]
+
+    def page_size(self, page_id):
+        sid, pno, rotation = self.pages[page_id]
+        w, h = self.source_size(sid, pno)
+        return (w, h) if rotation % 180 == 0 else (h, w)
+
+    def max_page_size(self):
+        width = height = 0
+        for sid, pno, rotation in self.pages:
+            w, h = self.source_size(sid, pno)
+            if rotation % 180: w, h = h, w
+            width, height = max(width, w), max(height, h)
+        return width, height
+
+    def load_page(self, page_id):
+        sid, pno, _ = self.pages[page_id]
+        doc, pno = self.sources[sid].locate(pno)
+        return doc.load_page(pno)
+
+    def sources_at(self, path):
+        if not os.path.exists(path): return []
+        return [sid for sid, source in enumerate(self.sources) if source.path and not isinstance(source, ArchiveSource)
+                and os.path.exists(source.path) and os.path.samefile(source.path, path)]
+
+    def adopt(self, path, order):
+        same = self.sources_at(path)
+        if not same: return False
+        for sid in same: self.sources[sid].close()
+        self.sources[same[0]].page_count = len(order)
+        self.sizes = {key: size for key, size in self.sizes.items() if key[0] not in same}
+        self.pages.replace(order, [(same[0], i, 0) for i in range(len(order))])
+        return True
+
+    def close(self):
+        for source in self.sources: source.close()
+
+def page_runs(vdoc, order):
+    runs = []
+    for page_id in order:
+        sid, pno, _ = vdoc.pages[page_id]
+        if runs and runs[-1][0] == sid and runs[-1][2] == pno - 1 and not isinstance(vdoc.sources[sid], ArchiveSource): runs[-1][2] = pno
+        else: runs.append([sid, pno, pno])
+    return runs
+
+def assemble(vdoc, order, progress=None):
+    with tracing.span("assemble", pages=len(order)):
+        runs = page_runs(vdoc, order)
+        source_ids = {vdoc.pages[page_id][0] for page_id in order}
+        source = vdoc.sources[source_ids.pop()] if len(source_ids) == 1 else None
+        page_nos = [vdoc.pages[page_id][1] for page_id in order]
+        if source is not None and not isinstance(source, ArchiveSource) and source.open() is not None and source.unchanged() and len(runs) * 2 > len(order) and len(set(page_nos)) == len(page_nos):
+            with tracing.span("select", pages=len(order)):
+                out = fitz.open(source.path)
+                out.select(page_nos)
+            if progress: progress(len(order), len(order))
+        else:
+            out, done = fitz.open(), 0
+            with tracing.span("insert_pdf", runs=len(runs), pages=len(order)):
+                for sid, first, last in runs:
+                    doc, start = vdoc.sources[sid].locate(first)
+                    out.insert_pdf(doc, from_page=start, to_page=start + last - first)
+                    done += last - first + 1
+                    if progress: progress(done, len(order))
+        with tracing.span("rotate") as info:
+            info["pages"] = rotate_pages(vdoc, order, out)
+    return out
+
+def rotate_pages(vdoc, order, doc):
+    rotated = 0
+    for i, page_id in enumerate(order):
+        rotation = vdoc.pages[page_id][2]
+        if rotation:
+            doc[i].set_rotation((doc[i].rotation + rotation) % 360)
+            rotated += 1
+    return rotated
+
+def default_workers():
+    return max(1, (os.cpu_count() or 2) - 1)
+
+def extract_image(doc, xref, max_res):
+    pix = fitz.Pixmap(doc, xref)
+    if pix.alpha: pix = fitz.Pixmap(pix, 0)
+    if pix.colorspace is None or pix.colorspace.name not in (fitz.csRGB.name, fitz.csGRAY.name):
+        pix = fitz.Pixmap(fitz.csGRAY if pix.colorspace is not None and pix.colorspace.n == 1 else fitz.csRGB, pix)
+    factor = 0
+    while max(pix.width, pix.height) >> (factor + 1) >= max_res: factor += 1
+    if factor: pix.shrink(factor)
+    return pix.width, pix.height, "L" if pix.n == 1 else "RGB", pix.samples
+
+def recompress_image(image, quality, max_res):
+    width, height, mode, samples = image
+    pil = Image.frombuffer(mode, (width, height), samples, "raw", mode, 0, 1)
+    ratio = max_res / max(width, height)
+    if ratio < 1:
+        pil = pil.resize((int(width*ratio), int(height*ratio)), Image.LANCZOS)
+    buf = io.BytesIO()
+    pil.save(buf, format="JPEG", quality=quality)
+    return buf.getvalue()
+
+def image_targets(doc, max_res, target_dpi=None):
+    found, scales = {}, {}
+    for pg in doc:
+        for img in pg.get_images():
+            found.setdefault(img[0], (pg.number, max(img[2], img[3])))
+        if not target_dpi: continue
+        for info in pg.get_image_info(xrefs=True):
+            if not info["xref"] or not info["width"] or not info["height"]: continue
+            m = fitz.Matrix(info["transform"])
+            scale = max(math.hypot(m.a, m.b) / 72 * target_dpi / info["width"],
+                        math.hypot(m.c, m.d) / 72 * target_dpi / info["height"])
+            scales[info["xref"]] = max(scales.get(info["xref"], 0), scale)
+    targets = {}
+    for xref, (pno, side) in found.items():
+        limit = math.ceil(side * min(1, scales[xref])) if xref in scales else max_res
+        if side > limit: targets[xref] = (pno, limit)
+    return targets
+
+def compress_images(doc, quality, max_res, progress=None, workers=None, target_dpi=None, min_saving=0):
+    if workers is None: workers = default_workers()
+    with tracing.span("compress_images", quality=quality, max_res=max_res, target_dpi=target_dpi, workers=workers) as info:
+        with tracing.span("image_targets"): targets = image_targets(doc, max_res, target_dpi)
+        info.update(images=len(targets), replaced=0, bytes_in=0, bytes_out=0)
+        recompress_targets(doc, targets, quality, progress, workers, min_saving, info)
+
+def recompress_targets(doc, targets, quality, progress, workers, min_saving, info):
+    total, done = len(targets), 0
+
+    def write_back(xref, encode):
+        nonlocal done
+        try:
+            if encode:
+                stream, original = encode(), len(doc.xref_stream_raw(xref))
+                info["bytes_in"] += original
+                if len(stream) <= original * (1 - min_saving / 100):
+                    doc[targets[xref][0]].replace_image(xref, stream=stream)
+                    info["replaced"] += 1
+                    original = len(stream)
+                info["bytes_out"] += original
+        except Exception as e: tracing.error("compress_image", e, xref=xref)
+        done += 1
+        if progress: progress(done, total)
+
+    def encode_job(xref):
+        limit = targets[xref][1]
+        return extract_image(doc, xref, limit), quality, limit
+
+    if workers <= 1 or total < 2:
+        for xref in targets: write_back(xref, lambda: recompress_image(*encode_job(xref)))
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = {}
+        queue = iter(targets)
+        while True:
+            for xref in queue:
+                try: pending[pool.submit(recompress_image, *encode_job(xref))] = xref
+                except Exception: write_back(xref, None)
+                if len(pending) >= workers * 2: break
+            if not pending: break
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished: write_back(pending.pop(future), future.result)
+
+def save_pdf(doc, path):
+    with tracing.span("save", pages=len(doc)) as info:
+        doc.save(path, garbage=4, deflate=True)
+        info["bytes_out"] = os.path.getsize(path)
+
+@contextmanager
+def save_target(vdoc, path):
+    same = vdoc.sources_at(path)
+    if not same:
+        yield path
+        return
+    fd, temp_path = tempfile.mkstemp(suffix=".pdf", dir=os.path.dirname(os.path.abspath(path)))
+    os.close(fd)
+    try:
+        yield temp_path
+        for sid in same: vdoc.sources[sid].close()
+        shutil.copymode(path, temp_path)
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path): os.remove(temp_path)
+
+def save_incremental(vdoc, order, path):
+    with tracing.span("save_incremental", pages=len(order)) as info:
+        info["applied"] = try_incremental(vdoc, order, path)
+    if info["applied"]: vdoc.adopt(path, order)
+    return info["applied"]
+
+def try_incremental(vdoc, order, path):
+    source_ids = {vdoc.pages[page_id][0] for page_id in order}
+    if len(source_ids) != 1: return False
+    source = vdoc.sources[source_ids.pop()]
+    page_nos = [vdoc.pages[page_id][1] for page_id in order]
+    if not source.path or isinstance(source, ArchiveSource) or len(set(page_nos)) != len(page_nos) or not source.open().can_save_incrementally() or not source.unchanged(): return False
+    if len(page_nos) < len(source.open()) * INCREMENTAL_MIN_KEPT: return False
+    if not (os.path.exists(path) and os.path.samefile(source.path, path)): shutil.copyfile(source.path, path)
+    doc = fitz.open(path)
+    try:
+        if page_nos != list(range(len(doc))): doc.select(page_nos)
+        rotate_pages(vdoc, order, doc)
+        if doc.is_dirty: doc.save(path, incremental=True, encryption=fitz.PDF_ENCRYPT_KEEP)
+    finally: doc.close()
+    return True
+
+def part_path(path, number):
+    rt, ex = os.path.splitext(path)
+    return f"{rt}_part_{number}{ex}"
+
+def sheet_size(sheet_format):
+    if sheet_format in SHEET_SIZES: return SHEET_SIZES[sheet_format]
+    m = SHEET_RE.match(sheet_format)
+    if not m or not float(m.group(1)) or not float(m.group(2)): raise ValueError(f"Unknown sheet size: {sheet_format}")
+    w, h = float(m.group(1)) * 72 / 25.4, float(m.group(2)) * 72 / 25.4
+    return max(w, h), min(w, h)
+
+def plan_signature(first, count, page_count, is_rtl=False):
+    sides = []
+    for k in range(count // 4):
+        for left, right in ((count - 1 - 2*k, 2*k), (2*k + 1, count - 2 - 2*k)):
+            if is_rtl: left, right = right, left
+            sides.append(tuple(first + n if first + n < page_count else None for n in (left, right)))
+    return sides
+
+def plan_booklet(page_count, sheets_per_sig=None, is_rtl=False):
+    chunk = sheets_per_sig * 4 if sheets_per_sig else (page_count + 3) // 4 * 4
+    if chunk == 0: chunk = 4
+    return [plan_signature(start, min(chunk, (page_count - start + 3) // 4 * 4), page_count, is_rtl)
+            for start in range(0, page_count, chunk)]
+
+def resolve_sides(vdoc, order, sides):
+    return [tuple(None if pos is None else vdoc.pages[order[pos]] for pos in side) for side in sides]
+
+def impose(out, sources, sides, sheet_w, sheet_h):
+    halves = (fitz.Rect(0, 0, sheet_w/2, sheet_h), fitz.Rect(sheet_w/2, 0, sheet_w, sheet_h))
+    for side in sides:
+        pg = out.new_page(width=sheet_w, height=sheet_h)
+        for rect, entry in zip(halves, side):
+            if entry is None: continue
+            sid, pno, rotation = entry
+            src, pno = sources[sid].locate(pno)
+            src_page = src[pno]
+            base = src_page.rotation
+            if base: src_page.set_rotation(0)
+            pg.show_pdf_page(rect, src, pno, keep_proportion=True, rotate=-(base + rotation) % 360)
+            if base: src_page.set_rotation(base)
+
+def write_part(sources, sides, sheet_w, sheet_h, path):
+    out = fitz.open()
+    try:
+        impose(out, sources, sides, sheet_w, sheet_h)
+        out.save(path)
+    finally: out.close()
+    return path
+
+def impose_part(paths, sides, sheet_w, sheet_h, path):
+    for p in paths:
+        if p not in _worker_sources: _worker_sources[p] = open_source(p)
+    sources = [_worker_sources[p] for p in paths]
+    return write_part(sources, sides, sheet_w, sheet_h, path)
+
+def make_booklet(vdoc, order, sheet_format="A4", direction="LTR", sheets_per_sig=None, parts_path=None, progress=None, workers=1, combine=True):
+    with tracing.span("booklet", pages=len(order), sheet=sheet_format, sheets_per_sig=sheets_per_sig, workers=workers) as info:
+        sheet_w, sheet_h = sheet_size(sheet_format)
+        signatures = [resolve_sides(vdoc, order, sides) for sides in plan_booklet(len(order), sheets_per_sig, direction == "RTL")]
+        info["signatures"] = len(signatures)
+        return impose_booklet(vdoc, signatures, sheet_w, sheet_h, sheets_per_sig, parts_path, progress, workers, combine)
+
+def impose_booklet(vdoc, signatures, sheet_w, sheet_h, sheets_per_sig, parts_path, progress, workers, combine):
+    final_doc = fitz.open() if combine or not (sheets_per_sig and parts_path) else None
+
+    if not (sheets_per_sig and parts_path):
+        for number, sides in enumerate(signatures, 1):
+            with tracing.span("impose", signature=number, sheets=len(sides) // 2): impose(final_doc, vdoc.sources, sides, sheet_w, sheet_h)
+            if progress: progress(number, len(signatures))
+        return final_doc
+
+    def collect(number):
+        if final_doc is not None:
+            with tracing.span("collect_part", signature=number), fitz.open(part_path(parts_path, number)) as part: final_doc.insert_pdf(part)
+        if progress: progress(number, len(signatures))
+
+    paths = [source.path for source in vdoc.sources]
+    if workers <= 1 or len(signatures) < 2 or not all(paths):
+        for number, sides in enumerate(signatures, 1):
+            with tracing.span("write_part", signature=number, sheets=len(sides) // 2): write_part(vdoc.sources, sides, sheet_w, sheet_h, part_path(parts_path, number))
+            collect(number)
+        return final_doc
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending, finished_numbers, collected = {}, set(), 0
+        queue = iter(enumerate(signatures, 1))
+        while True:
+            for number, sides in queue:
+                pending[pool.submit(impose_part, paths, sides, sheet_w, sheet_h, part_path(parts_path, number))] = number, time.perf_counter()
+                if len(pending) >= workers * 2: break
+            if not pending: break
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                future.result()
+                number, submitted = pending.pop(future)
+                tracing.record("impose_part", submitted, signature=number)
+                finished_numbers.add(number)
+            while collected + 1 in finished_numbers:
+                collected += 1
+                collect(collected)
+    return final_doc
+
+def parse_spec(spec):
+    path, sep, items = spec.rpartition(":")
+    if not sep or not SPEC_RE.match(items) or not path:
+        return spec, [], 0
+    ranges, rotation = [], 0
+    for item in items.split(","):
+        if item.startswith("r"):
+            rotation = int(item[1:])
+            if rotation % 90: raise ValueError(f"Rotation must be a multiple of 90: {spec}")
+            continue
+        first, dash, last = item.partition("-")
+        ranges.append((int(first), int(last) if last else (None if dash else int(first))))
+    return path, ranges, rotation % 360
+
+def pages_from_spec(ranges, page_count):
+    if not ranges: return list(range(page_count))
+    pages = []
+    for first, last in ranges:
+        if last is None: last = page_count
+        for pno in (range(first, last + 1) if first <= last else range(first, last - 1, -1)):
+            if not 1 <= pno <= page_count: raise ValueError(f"Page {pno} out of range 1-{page_count}")
+            pages.append(pno - 1)
+    return pages
+
+def build_from_specs(specs, progress=None, workers=None):
+    parsed = [parse_spec(spec) for spec in specs]
+    paths = list(dict.fromkeys(path for path, _, _ in parsed))
+    vdoc, ids, errors = VirtualDocument(), {}, []
+    with tracing.span("load", files=len(paths), workers=workers) as info:
+        for path, (prepared, error) in zip(paths, prepare_sources(paths, progress=progress, workers=workers)):
+            if error is not None: errors.append(f"Error {path}: {error}")
+            else: ids[path] = vdoc.add_source(*prepared)
+        info["errors"] = len(errors)
+    if errors:
+        vdoc.close()
+        raise Exception("\n".join(errors))
+    for path, ranges, rotation in parsed:
+        sid = ids[path]
+        vdoc.add_pages(sid, pages_from_spec(ranges, vdoc.sources[sid].page_count), rotation)
+    return vdoc
+
+def print_progress(label):
+    def report(done, total):
+        print(f"\r{label}: {done}/{total}", end="" if done < total else "\n", file=sys.stderr)
+    return report
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="engine.py", description="Merge, reorder, rotate, compress and impose PDFs without the GUI.")
+    parser.add_argument("specs", nargs="+", metavar="FILE[:PAGES][,rDEG]", help="source file with optional 1-based pages/ranges (e.g. a.pdf:1-10,r90 b.pdf:3 c.pdf:9-)")
+    parser.add_argument("-o", "--output", required=True)
+    parser.add_argument("--compress", action="store_true", help="recompress oversized images as JPEG")
+    parser.add_argument("--quality", type=int, default=70)
+    parser.add_argument("--max-res", type=int, default=1200, help="longest image side in pixels (default: %(default)s)")
+    parser.add_argument("--dpi", type=int, help="downsample images to this DPI at their size on the page instead of --max-res")
+    parser.add_argument("--min-saving", type=float, default=10, metavar="PCT", help="keep an image's original stream unless re-encoding saves PCT%% (default: %(default)s)")
+    parser.add_argument("--workers", type=int, default=default_workers(), help="processes used to load sources, recompress images and impose signatures (default: %(default)s)")
+    parser.add_argument("--rebuild", action="store_true", help="always rewrite the whole file instead of appending an incremental update to a single source PDF")
+    parser.add_argument("--booklet", metavar="SIZE", help=f"impose the result as a booklet on this sheet size ({', '.join(SHEET_SIZES)} or WxH in mm, e.g. 330x480)")
+    parser.add_argument("--rtl", action="store_true", help="right-to-left booklet")
+    parser.add_argument("--signatures", type=int, metavar="SHEETS", help="split the booklet into signatures of SHEETS sheets, also written as _part_N files")
+    parser.add_argument("--parts-only", action="store_true", help="with --signatures, only write the _part_N files and skip the combined booklet")
+    parser.add_argument("--trace", metavar="DIR", help="record stage timings and memory use and write a Chrome trace (trace_*.json) and summary (trace_*.log) to DIR")
+    parser.add_argument("-q", "--quiet", action="store_true")
+    args = parser.parse_args(argv)
+    if args.booklet:
+        try: sheet_size(args.booklet)
+        except ValueError as e: parser.error(str(e))
+    if args.parts_only and not (args.booklet and args.signatures): parser.error("--parts-only requires --booklet and --signatures")
+    if args.trace:
+        tracing.enable()
+        try: return run(parser, args)
+        finally:
+            path = tracing.export(args.trace)
+            if not args.quiet: print(f"Trace: {path}", file=sys.stderr)
+    return run(parser, args)
+
+def run(parser, args):
+    progress = (lambda label: None) if args.quiet else print_progress
+    try: vdoc = build_from_specs(args.specs, progress("Loading"), args.workers)
+    except Exception as e: parser.exit(1, f"{e}\n")
+    order = list(range(len(vdoc)))
+    if not (args.booklet or args.compress or args.rebuild) and save_incremental(vdoc, order, args.output):
+        if not args.quiet: print(f"{args.output}: {len(order)} pages (incremental)", file=sys.stderr)
+        vdoc.close()
+        return 0
+    if args.booklet:
+        out = make_booklet(vdoc, order, args.booklet, "RTL" if args.rtl else "LTR",
+                           args.signatures, args.output if args.signatures else None, progress("Booklet"),
+                           args.workers, not args.parts_only)
+    else:
+        out = assemble(vdoc, order, progress("Assembling"))
+    vdoc.close()
+    if out is None:
+        if not args.quiet: print(f"{part_path(args.output, 'N')}: {len(order)} pages in parts", file=sys.stderr)
+        return 0
+    with save_target(vdoc, args.output) as target:
+        try:
+            if args.compress: compress_images(out, args.quality, args.max_res, progress("Compressing"), args.workers, args.dpi, args.min_saving)
+            save_pdf(out, target)
+            page_count = len(out)
+        finally: out.close()
+    if not args.quiet: print(f"{args.output}: {page_count} pages", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,37 @@
+import threading
+import queue
+import tracing
+
+class Cancelled(Exception):
+    pass
+
+class Job:
+    def __init__(self, work, name="job"):
+        self.work = work
+        self.name = name
+        self.events = queue.Queue()
+        self.cancel_requested = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def run(self):
+        try:
+            with tracing.span(self.name): result = self.work(self)
+            self.events.put(("done", result, None))
+        except Exception as e: self.events.put(("done", None, e))
+
+    def progress(self, value, text=None):
+        if self.cancel_requested.is_set(): raise Cancelled()
+        self.events.put(("progress", value, text))
+
+    def cancel(self):
+        self.cancel_requested.set()
+
+    def poll(self):
+        events = []
+        while True:
+            try: events.append(self.events.get_nowait())
+            except queue.Empty: return events
@@ -0,0 +1,139 @@
+from array import array
+from bisect import bisect_right
+from itertools import accumulate
+
+CHUNK_SIZE = 512
+
+def make_chunk(rows):
+    sids, pnos, codes = array("I"), array("I"), array("B")
+    for sid, pno, code in rows:
+        sids.append(sid)
+        pnos.append(pno)
+        codes.append(code)
+    return sids, pnos, codes
+
+def make_chunks(rows):
+    rows = [(sid, pno, rotation % 360 // 90) for sid, pno, rotation in rows]
+    return [make_chunk(rows[i:i + CHUNK_SIZE]) for i in range(0, len(rows), CHUNK_SIZE)]
+
+class PageTable:
+    def __init__(self):
+        self.state = ((), [0])
+
+    def commit(self, chunks):
+        merged = []
+        for chunk in chunks:
+            if not len(chunk[0]): continue
+            if merged and len(merged[-1][0]) + len(chunk[0]) <= CHUNK_SIZE and min(len(merged[-1][0]), len(chunk[0])) < CHUNK_SIZE // 2:
+                merged[-1] = tuple(a + b for a, b in zip(merged[-1], chunk))
+            else: merged.append(chunk)
+        self.state = (tuple(merged), [0, *accumulate(len(chunk[0]) for chunk in merged)])
+
+    def snapshot(self):
+        return self.state
+
+    def restore(self, snapshot):
+        self.state = snapshot
+
+    def __len__(self):
+        return self.state[1][-1]
+
+    def __getitem__(self, pos):
+        chunks, starts = self.state
+        if pos < 0: pos += starts[-1]
+        if not 0 <= pos < starts[-1]: raise IndexError("page position out of range")
+        i = bisect_right(starts, pos) - 1
+        sids, pnos, codes = chunks[i]
+        j = pos - starts[i]
+        return sids[j], pnos[j], codes[j] * 90
+
+    def __iter__(self):
+        for sids, pnos, codes in self.state[0]:
+            for j in range(len(sids)): yield sids[j], pnos[j], codes[j] * 90
+
+    def extend(self, sid, page_nos, rotation=0):
+        start = len(self)
+        self.commit(list(self.state[0]) + make_chunks((sid, pno, rotation) for pno in page_nos))
+        return range(start, len(self))
+
+    def insert(self, pos, rows):
+        chunks, starts = self.state
+        chunks, new = list(chunks), make_chunks(rows)
+        i = bisect_right(starts, pos) - 1 if pos < starts[-1] else len(chunks)
+        if i < len(chunks) and pos > starts[i]:
+            j = pos - starts[i]
+            chunks[i:i + 1] = [tuple(a[:j] for a in chunks[i]), *new, tuple(a[j:] for a in chunks[i])]
+        else: chunks[i:i] = new
+        self.commit(chunks)
+
+    def delete(self, positions):
+        chunks, starts = self.state
+        chunks, drop = list(chunks), {}
+        for pos in positions:
+            i = bisect_right(starts, pos) - 1
+            drop.setdefault(i, set()).add(pos - starts[i])
+        for i, rows in drop.items():
+            chunks[i] = make_chunk(row for j, row in enumerate(zip(*chunks[i])) if j not in rows)
+        self.commit(chunks)
+
+    def replace(self, positions, rows):
+        chunks, starts = self.state
+        chunks, copied = list(chunks), set()
+        for pos, (sid, pno, rotation) in zip(positions, rows):
+            i = bisect_right(starts, pos) - 1
+            if i not in copied:
+                chunks[i] = tuple(array(a.typecode, a) for a in chunks[i])
+                copied.add(i)
+            j = pos - starts[i]
+            chunks[i][0][j], chunks[i][1][j], chunks[i][2][j] = sid, pno, rotation % 360 // 90
+        self.commit(chunks)
+
+    def rotate(self, positions, angle):
+        positions = list(positions)
+        self.replace(positions, [(sid, pno, rotation + angle) for sid, pno, rotation in map(self.__getitem__, positions)])
+
+    def move(self, positions, target):
+        positions = list(positions)
+        rows = [self[pos] for pos in positions]
+        self.delete(positions)
+        self.insert(target, rows)
+
+class Selection:
+    def __init__(self, ranges=()):
+        self.ranges = [tuple(r) for r in ranges if r[0] < r[1]]
+
+    def __len__(self):
+        return sum(stop - start for start, stop in self.ranges)
+
+    def __bool__(self):
+        return bool(self.ranges)
+
+    def __contains__(self, pos):
+        i = bisect_right(self.ranges, (pos, float("inf"))) - 1
+        return i >= 0 and pos < self.ranges[i][1]
+
+    def __iter__(self):
+        for start, stop in self.ranges: yield from range(start, stop)
+
+    def copy(self):
+        return Selection(self.ranges)
+
+    def clear(self):
+        self.ranges = []
+
+    def add(self, start, stop=None):
+        stop = start + 1 if stop is None else stop
+        kept = [r for r in self.ranges if r[1] < start or r[0] > stop]
+        joined = [r for r in self.ranges if not (r[1] < start or r[0] > stop)]
+        merged = (min([start] + [r[0] for r in joined]), max([stop] + [r[1] for r in joined]))
+        self.ranges = sorted(kept + [merged])
+
+    def remove(self, pos):
+        ranges = []
+        for start, stop in self.ranges:
+            if start <= pos < stop: ranges += [r for r in ((start, pos), (pos + 1, stop)) if r[0] < r[1]]
+            else: ranges.append((start, stop))
+        self.ranges = ranges
+
+    def shifted(self, offset):
+        return Selection((start + offset, stop + offset) for start, stop in self.ranges)
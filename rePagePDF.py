@@ -1,10 +1,22 @@
+import time
+STARTED = time.perf_counter()
 import customtkinter as ctk
 from tkinter import filedialog, messagebox
-import fitz
 from PIL import Image
-import io
 import os
+import re
+import sys
 import configparser
+import tempfile
+import shutil
+import multiprocessing
+from collections import OrderedDict
+from jobs import Job, Cancelled
+from pagetable import PageTable, Selection
+from canvasgrid import ThumbnailCanvas
+import tracing
+
+fitz = engine = None
 
 ctk.set_appearance_mode("System")
 ctk.set_default_color_theme("blue")
@@ -16,14 +28,9 @@ class ConfigManager:
         
         app_data = os.getenv('APPDATA')
         self.save_dir = os.path.join(app_data, "rePagePDF")
-        
-        if not os.path.exists(self.save_dir):
-            os.makedirs(self.save_dir)
-
         self.config_file = os.path.join(self.save_dir, "settings.ini")
         
         self.config = configparser.ConfigParser()
-        self.lang_config = configparser.ConfigParser()
         
         self.load_settings()
         
@@ -46,9 +53,9 @@ class ConfigManager:
             'last_dir': '',
             'zoom': '0.2'
         }
-        self.save_settings()
 
     def save_settings(self):
+        os.makedirs(self.save_dir, exist_ok=True)
         with open(self.config_file, 'w', encoding='utf-8') as f:
             self.config.write(f)
 
@@ -82,13 +89,17 @@ class ConfigManager:
             "lbl_zoom": "Zoom:",
             "lbl_actions": "Actions:",
             "lbl_rotate": "Rotate:",
-            "lbl_hint": "Ctrl+Wheel: Zoom | Ctrl+A: Select All | Ctrl/Shift+Click: Select",
+            "lbl_hint": "Ctrl+Wheel: Zoom | Ctrl+A: Select All | Ctrl/Shift+Click: Select | Ctrl+Z/Y: Undo/Redo",
             "lbl_wait": "Please wait...",
             "lbl_saving": "Saving...",
             "lbl_preview": "Preview: {}/{}",
+            "lbl_compressing": "Compressing images: {}/{}",
             "status_ready": "Ready",
             "status_loaded": "Loaded: {} pages",
+            "err_files_skipped": "Some files could not be opened and were skipped:",
+            "status_cancelled": "Cancelled",
             "status_error": "Error",
+            "status_cache": "Thumbnail cache: {} images, {} hits, {} misses, {:.1f} MB",
             "msg_success": "Success",
             "msg_saved": "File saved!",
             "msg_done": "Done!",
@@ -100,20 +111,28 @@ class ConfigManager:
             "presets": "Presets:",
             "quality_jpeg": "JPEG Quality:",
             "max_side": "Max Side (px):",
+            "downsample_by": "Downsample by:",
+            "mode_max_side": "Max side",
+            "mode_dpi": "Page DPI",
+            "target_dpi": "Target DPI:",
+            "min_saving": "Min. saving:",
             "preset_web": "Web (72dpi)",
             "preset_print": "Print (300dpi)",
             "preset_custom": "Custom",
             "comp_mode_lossless": "Lossless",
+            "comp_mode_rebuild": "Lossless (rebuild)",
             "comp_mode_compressed": "Compressed",
             "booklet_title": "Booklet Settings",
             "print_params": "Print Parameters",
             "paper_format": "Paper Format:",
+            "err_sheet_size": "Unknown paper size. Use a preset or width x height in mm, e.g. 330x480.",
             "reading_dir": "Reading Direction:",
             "dir_ltr": "LTR (Left-Right)",
             "dir_rtl": "RTL (Right-Left)",
             "binding": "Binding (Signatures)",
             "split_parts": "Split into parts",
             "sheets_per_part": "Sheets per part:",
+            "parts_only": "Write parts only (no combined booklet)",
             "warn_sheets": "⚠ >20 sheets. Splitting recommended.",
             "printer_hint": "ℹ Print: Double-sided, flip on short edge",
             "file_supported": "Supported Files",
@@ -121,10 +140,13 @@ class ConfigManager:
             "file_img": "Images"
         }
 
+        self.lang_text, self.lang_sections = "", {}
         if os.path.exists(self.lang_file):
             try:
-                self.lang_config.read(self.lang_file, encoding='utf-8')
-                self.available_languages = self.lang_config.sections()
+                with open(self.lang_file, encoding='utf-8') as f:
+                    self.lang_text = f.read()
+                self.lang_sections = {m.group(1).strip(): m.start() for m in re.finditer(r"^\[([^\]]+)\]", self.lang_text, re.M)}
+                self.available_languages = list(self.lang_sections)
                 if not self.available_languages:
                     self.available_languages = ["English"]
             except Exception as e:
@@ -136,14 +158,20 @@ class ConfigManager:
             if self.available_languages:
                 current = self.available_languages[0]
         
-        self.set_language(current)
+        self.load_language(current)
 
-    def set_language(self, lang_name):
+    def load_language(self, lang_name):
         self.current_lang_name = lang_name
-        if lang_name in self.lang_config:
-            self.current_lang_data = dict(self.lang_config[lang_name])
-        else:
-            self.current_lang_data = self.fallback_lang
+        self.current_lang_data = self.fallback_lang
+        if lang_name in self.lang_sections:
+            start = self.lang_sections[lang_name]
+            end = min([pos for pos in self.lang_sections.values() if pos > start], default=len(self.lang_text))
+            section = configparser.ConfigParser()
+            section.read_string(self.lang_text[start:end])
+            self.current_lang_data = dict(section[lang_name])
+
+    def set_language(self, lang_name):
+        self.load_language(lang_name)
         self.set_setting('language', lang_name)
 
     def get_text(self, key):
@@ -151,6 +179,59 @@ class ConfigManager:
 
 cfg = ConfigManager()
 
+class ThumbnailCache:
+    def __init__(self, max_bytes, max_levels=3):
+        self.max_bytes = max_bytes
+        self.max_levels = max_levels
+        self.entries = OrderedDict()
+        self.levels = {}
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        item = self.entries.get(key)
+        if item is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return item[0]
+
+    def put(self, key, image, nbytes):
+        if key in self.entries: self._drop(key)
+        self.entries[key] = (image, nbytes)
+        self.size += nbytes
+        zooms = self.levels.setdefault(key[:2], [])
+        zooms.append(key[2])
+        while len(zooms) > self.max_levels:
+            self._drop(key[:2] + (zooms[0],))
+        while self.size > self.max_bytes and len(self.entries) > 1:
+            self._drop(next(iter(self.entries)))
+
+    def _drop(self, key):
+        self.size -= self.entries.pop(key)[1]
+        zooms = self.levels[key[:2]]
+        zooms.remove(key[2])
+        if not zooms: del self.levels[key[:2]]
+
+    def nearest(self, page_key, zoom):
+        zooms = self.levels.get(page_key)
+        if not zooms: return None
+        above = [z for z in zooms if z >= zoom]
+        level = min(above) if above else max(zooms)
+        return level, self.entries[page_key + (level,)][0]
+
+    def clear(self):
+        self.entries.clear()
+        self.levels.clear()
+        self.size = 0
+
+    def stats(self):
+        total = self.hits + self.misses
+        ratio = self.hits / total * 100 if total else 0
+        return f"hits {self.hits}, misses {self.misses} ({ratio:.0f}% hit), {len(self.entries)} thumbs, {self.size / 1048576:.1f}/{self.max_bytes / 1048576:.0f} MB"
+
 class MainSettingsDialog(ctk.CTkToplevel):
     def __init__(self, parent):
         super().__init__(parent)
@@ -185,7 +266,7 @@ class CompressionSettingsDialog(ctk.CTkToplevel):
     def __init__(self, parent):
         super().__init__(parent)
         self.title(cfg.get_text("settings_compression_title"))
-        self.geometry("420x350")
+        self.geometry("420x600")
         self.resizable(False, False)
         self.transient(parent)
         self.grab_set()
@@ -206,22 +287,43 @@ class CompressionSettingsDialog(ctk.CTkToplevel):
         self.cmb_presets.grid(row=1, column=1, padx=20, pady=10, sticky="ew")
         self.cmb_presets.set(self.txt_web)
 
-        ctk.CTkLabel(self, text=cfg.get_text("quality_jpeg")).grid(row=2, column=0, padx=20, sticky="e")
+        self.txt_mode_side = cfg.get_text("mode_max_side")
+        self.txt_mode_dpi = cfg.get_text("mode_dpi")
+
+        ctk.CTkLabel(self, text=cfg.get_text("downsample_by")).grid(row=2, column=0, padx=20, sticky="e")
+        self.seg_mode = ctk.CTkSegmentedButton(self, values=[self.txt_mode_side, self.txt_mode_dpi], command=self.on_mode_change)
+        self.seg_mode.grid(row=2, column=1, padx=20, pady=10, sticky="ew")
+
+        ctk.CTkLabel(self, text=cfg.get_text("quality_jpeg")).grid(row=3, column=0, padx=20, sticky="e")
         self.lbl_quality_val = ctk.CTkLabel(self, text="70")
-        self.lbl_quality_val.grid(row=2, column=1, padx=(20, 10), sticky="w")
+        self.lbl_quality_val.grid(row=3, column=1, padx=(20, 10), sticky="w")
         
         self.slider_quality = ctk.CTkSlider(self, from_=10, to=100, number_of_steps=90, command=self.update_labels)
-        self.slider_quality.grid(row=3, column=0, columnspan=2, padx=20, pady=(0, 20), sticky="ew")
+        self.slider_quality.grid(row=4, column=0, columnspan=2, padx=20, pady=(0, 20), sticky="ew")
 
-        ctk.CTkLabel(self, text=cfg.get_text("max_side")).grid(row=4, column=0, padx=20, sticky="e")
+        ctk.CTkLabel(self, text=cfg.get_text("max_side")).grid(row=5, column=0, padx=20, sticky="e")
         self.lbl_res_val = ctk.CTkLabel(self, text="1200 px")
-        self.lbl_res_val.grid(row=4, column=1, padx=(20, 10), sticky="w")
+        self.lbl_res_val.grid(row=5, column=1, padx=(20, 10), sticky="w")
 
         self.slider_res = ctk.CTkSlider(self, from_=600, to=3000, number_of_steps=24, command=self.update_labels)
-        self.slider_res.grid(row=5, column=0, columnspan=2, padx=20, pady=(0, 20), sticky="ew")
+        self.slider_res.grid(row=6, column=0, columnspan=2, padx=20, pady=(0, 20), sticky="ew")
+
+        ctk.CTkLabel(self, text=cfg.get_text("target_dpi")).grid(row=7, column=0, padx=20, sticky="e")
+        self.lbl_dpi_val = ctk.CTkLabel(self, text="72 dpi")
+        self.lbl_dpi_val.grid(row=7, column=1, padx=(20, 10), sticky="w")
+
+        self.slider_dpi = ctk.CTkSlider(self, from_=50, to=600, number_of_steps=110, command=self.update_labels)
+        self.slider_dpi.grid(row=8, column=0, columnspan=2, padx=20, pady=(0, 20), sticky="ew")
+
+        ctk.CTkLabel(self, text=cfg.get_text("min_saving")).grid(row=9, column=0, padx=20, sticky="e")
+        self.lbl_saving_val = ctk.CTkLabel(self, text="10%")
+        self.lbl_saving_val.grid(row=9, column=1, padx=(20, 10), sticky="w")
+
+        self.slider_saving = ctk.CTkSlider(self, from_=0, to=50, number_of_steps=50, command=self.update_labels)
+        self.slider_saving.grid(row=10, column=0, columnspan=2, padx=20, pady=(0, 20), sticky="ew")
 
         self.btn_ok = ctk.CTkButton(self, text=cfg.get_text("btn_apply"), command=self.on_ok)
-        self.btn_ok.grid(row=6, column=0, columnspan=2, padx=50, pady=20, sticky="ew")
+        self.btn_ok.grid(row=11, column=0, columnspan=2, padx=50, pady=20, sticky="ew")
 
         self.on_preset_change(self.txt_web)
 
@@ -230,20 +332,35 @@ class CompressionSettingsDialog(ctk.CTkToplevel):
         r = int(self.slider_res.get())
         self.lbl_quality_val.configure(text=str(q))
         self.lbl_res_val.configure(text=f"{r} px")
+        self.lbl_dpi_val.configure(text=f"{int(self.slider_dpi.get())} dpi")
+        self.lbl_saving_val.configure(text=f"{int(self.slider_saving.get())}%")
+
+    def on_mode_change(self, choice):
+        is_dpi = (choice == self.txt_mode_dpi)
+        self.slider_dpi.configure(state="normal" if is_dpi else "disabled")
+        self.slider_res.configure(state="disabled" if is_dpi else "normal")
 
     def on_preset_change(self, choice):
         if choice == self.txt_web:
             self.slider_quality.set(70)
             self.slider_res.set(1200)
+            self.slider_dpi.set(72)
         elif choice == self.txt_print:
             self.slider_quality.set(85)
             self.slider_res.set(2400)
+            self.slider_dpi.set(300)
+        if choice != self.txt_custom:
+            self.slider_saving.set(10)
+            self.seg_mode.set(self.txt_mode_dpi)
+            self.on_mode_change(self.txt_mode_dpi)
         self.update_labels()
 
     def on_ok(self):
         self.settings = {
             "quality": int(self.slider_quality.get()),
-            "max_res": int(self.slider_res.get())
+            "max_res": int(self.slider_res.get()),
+            "target_dpi": int(self.slider_dpi.get()) if self.seg_mode.get() == self.txt_mode_dpi else None,
+            "min_saving": int(self.slider_saving.get())
         }
         self.destroy()
 
@@ -251,7 +368,7 @@ class BookletOptionsDialog(ctk.CTkToplevel):
     def __init__(self, parent, page_count):
         super().__init__(parent)
         self.title(cfg.get_text("booklet_title"))
-        self.geometry("380x460")
+        self.geometry("380x495")
         self.resizable(False, False)
         self.transient(parent)
         self.grab_set()
@@ -269,7 +386,7 @@ class BookletOptionsDialog(ctk.CTkToplevel):
         ctk.CTkLabel(self, text=info_text, text_color="gray", font=("Arial", 11)).grid(row=1, column=0, columnspan=2, pady=(0, 10))
 
         ctk.CTkLabel(self, text=cfg.get_text("paper_format")).grid(row=2, column=0, padx=20, sticky="w")
-        self.cmb_format = ctk.CTkOptionMenu(self, values=["A4", "Letter"], height=28, width=150)
+        self.cmb_format = ctk.CTkComboBox(self, values=list(engine.SHEET_SIZES), height=28, width=150)
         self.cmb_format.grid(row=2, column=1, padx=20, pady=5, sticky="e")
         self.cmb_format.set("A4")
 
@@ -306,6 +423,11 @@ class BookletOptionsDialog(ctk.CTkToplevel):
         self.slider_sheets.set(12) 
         self.slider_sheets.grid(row=1, column=0, columnspan=3, padx=10, pady=(5, 0), sticky="ew")
 
+        self.parts_only_var = ctk.BooleanVar(value=False)
+        self.chk_parts_only = ctk.CTkSwitch(self.frame_slider, text=cfg.get_text("parts_only"), font=("Arial", 11),
+                                            variable=self.parts_only_var)
+        self.chk_parts_only.grid(row=2, column=0, columnspan=3, padx=10, pady=(8, 0), sticky="w")
+
         self.lbl_warning = ctk.CTkLabel(self, text="", font=("Arial", 10), text_color="#E0a800")
         self.lbl_warning.grid(row=8, column=0, columnspan=2, pady=(5, 0))
 
@@ -331,15 +453,19 @@ class BookletOptionsDialog(ctk.CTkToplevel):
         state = "normal" if is_active else "disabled"
         color = ("black", "white") if is_active else "gray"
         self.slider_sheets.configure(state=state)
+        self.chk_parts_only.configure(state=state)
         self.lbl_sheets_title.configure(text_color=color)
         self.lbl_sheets_val.configure(text_color=color)
 
     def on_ok(self):
+        try: engine.sheet_size(self.cmb_format.get())
+        except ValueError: return messagebox.showerror(cfg.get_text("status_error"), cfg.get_text("err_sheet_size"), parent=self)
         self.result = {
             "format": self.cmb_format.get(),
             "direction": self.dir_map.get(self.cmb_direction.get(), "LTR"),
             "use_signatures": self.use_signatures_var.get(),
-            "sheets_per_sig": int(self.slider_sheets.get())
+            "sheets_per_sig": int(self.slider_sheets.get()),
+            "parts_only": self.use_signatures_var.get() and self.parts_only_var.get()
         }
         self.destroy()
 
@@ -351,21 +477,59 @@ class PrinterApp(ctk.CTk):
         self.after(0, lambda: self.state("zoomed"))
         
         self.doc = None
-        self.pages_order = []
-        self.page_rotations = {}
-        self.selected_indices = set() 
-        self.last_selected_index = None 
+        self.pages = PageTable()
+        self.selected_indices = Selection()
+        self.last_selected_index = None
+        self.undo_stack, self.redo_stack = [], []
+        self.undo_limit = int(cfg.get_setting("undo_limit", 1000))
         self.zoom_scale = float(cfg.get_setting("zoom", 0.2))
         self.min_zoom, self.max_zoom = 0.05, 0.8
-        self.buttons_list = []
+        self.grid_buttons = {}
+        self.button_pool = []
+        self.grid_cols, self.grid_rows, self.grid_page_size = 1, 0, None
+        self.grid_overscan = int(cfg.get_setting("grid_overscan", 2))
+        self.viewport_pending = False
+        self.zoom_job = None
+        self.zoom_debounce = int(cfg.get_setting("zoom_debounce_ms", 250))
         self.drag_data = {"active": False, "start_x": 0, "start_y": 0, "target_index": None, "pending_select": None}
         self.autoscroll_active = False
         self.compression_mode_index = 0
-        
+        self.thumb_cache = ThumbnailCache(int(float(cfg.get_setting("thumb_cache_mb", 256)) * 1048576))
+        self.temp_dir = None
+        self.disk_cache, self.renderer = None, None
+        self.render_polling = False
+        self.job, self.job_window = None, None
+        self.actions_state = "disabled"
+        self.canvas_grid = cfg.get_setting("grid_backend", "buttons") == "canvas"
+        self.canvas_pressed = False
+        self.placeholder = None
+        self.trace_dir = os.path.join(cfg.save_dir, "traces")
+        if cfg.get_setting("trace", "0") == "1": tracing.enable(STARTED)
+        self.startup_time = None
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
+
         self._setup_layout()
         self._setup_bindings()
         
         self.refresh_ui_text()
+        self.after_idle(self.on_started)
+
+    def on_started(self):
+        self.startup_time = time.perf_counter() - STARTED
+        tracing.record("startup", STARTED)
+        if "--startup-time" in sys.argv:
+            print(f"Startup: {self.startup_time * 1000:.0f} ms")
+            self.on_close()
+
+    def start_engine(self):
+        global fitz, engine
+        if engine is not None: return
+        import fitz, engine
+        from renderer import ThumbnailRenderer, DiskCache
+        render_workers = int(cfg.get_setting("render_workers", engine.default_workers()))
+        disk_cache_mb = float(cfg.get_setting("thumb_disk_cache_mb", 512))
+        self.disk_cache = DiskCache(os.path.join(cfg.save_dir, "thumbs"), int(disk_cache_mb * 1048576)) if disk_cache_mb > 0 else None
+        self.renderer = ThumbnailRenderer(render_workers, self.disk_cache) if render_workers > 0 else None
         
     def _setup_layout(self):
         self.grid_columnconfigure(1, weight=1)
@@ -396,7 +560,7 @@ class PrinterApp(ctk.CTk):
 
         self.compression_var = ctk.StringVar(value=cfg.get_text("comp_mode_lossless"))
         self.cmb_compression = ctk.CTkOptionMenu(self.sidebar, 
-                                                 values=[cfg.get_text("comp_mode_lossless"), cfg.get_text("comp_mode_compressed")], 
+                                                 values=[cfg.get_text("comp_mode_lossless"), cfg.get_text("comp_mode_compressed"), cfg.get_text("comp_mode_rebuild")], 
                                                  variable=self.compression_var,
                                                  command=self.on_compression_change)
         self.cmb_compression.grid(row=4, column=0, padx=10, pady=5)
@@ -450,11 +614,14 @@ class PrinterApp(ctk.CTk):
         self.btn_delete = ctk.CTkButton(self.sidebar, text=cfg.get_text("btn_delete"), fg_color="red", command=self.delete_pages, state="disabled")
         self.btn_delete.grid(row=15, column=0, padx=10, pady=20)
 
-        self.lbl_hint = ctk.CTkLabel(self.sidebar, text=cfg.get_text("lbl_hint"), font=("Arial", 10), text_color="gray")
+        self.lbl_hint = ctk.CTkLabel(self.sidebar, text=cfg.get_text("lbl_hint"), font=("Arial", 10), text_color="gray", wraplength=240)
         self.lbl_hint.grid(row=16, column=0, pady=5)
 
         self.lbl_status = ctk.CTkLabel(self.sidebar, text=cfg.get_text("status_ready"), font=("Arial", 12))
-        self.lbl_status.grid(row=17, column=0, pady=20, sticky="s")
+        self.lbl_status.grid(row=17, column=0, pady=(20, 5), sticky="s")
+
+        self.lbl_cache = ctk.CTkLabel(self.sidebar, text="", font=("Arial", 10), text_color="gray", wraplength=240)
+        self.lbl_cache.grid(row=18, column=0, pady=(0, 20))
 
         self.right_panel = ctk.CTkFrame(self, fg_color="transparent")
         self.right_panel.grid(row=0, column=1, sticky="nsew", padx=10, pady=10)
@@ -464,8 +631,11 @@ class PrinterApp(ctk.CTk):
         self.scroll_sensor_top = ctk.CTkFrame(self.right_panel, height=25, corner_radius=5, fg_color=("gray85", "gray25"))
         self.scroll_sensor_top.grid(row=0, column=0, sticky="ew", pady=(0, 2))
 
-        self.grid_area = ctk.CTkScrollableFrame(self.right_panel)
+        if self.canvas_grid: self.grid_area = ThumbnailCanvas(self.right_panel, self.on_canvas_press, self.on_canvas_motion, self.on_canvas_release)
+        else: self.grid_area = ThumbnailCanvas(self.right_panel)
+        self.grid_canvas, self.grid_scrollbar = self.grid_area.canvas, self.grid_area.scrollbar
         self.grid_area.grid(row=1, column=0, sticky="nsew")
+        self.grid_canvas.configure(yscrollcommand=self.on_grid_scroll)
 
         self.scroll_sensor_bottom = ctk.CTkFrame(self.right_panel, height=25, corner_radius=5, fg_color=("gray85", "gray25"))
         self.scroll_sensor_bottom.grid(row=2, column=0, sticky="ew", pady=(2, 0))
@@ -477,12 +647,26 @@ class PrinterApp(ctk.CTk):
         self.bind("<Control-Button-5>", self.on_mouse_zoom)
         self.bind("<Control-a>", self.select_all)
         self.bind("<Control-A>", self.select_all)
+        self.bind("<Control-z>", self.undo)
+        self.bind("<Control-Z>", self.redo)
+        self.bind("<Control-y>", self.redo)
+
+    def on_close(self):
+        if self.job:
+            self.job.cancel()
+            self.job.thread.join()
+        if self.renderer: self.renderer.shutdown()
+        if self.disk_cache: self.disk_cache.trim()
+        if self.doc is not None: self.doc.close()
+        if self.temp_dir: shutil.rmtree(self.temp_dir, ignore_errors=True)
+        tracing.export(self.trace_dir)
+        self.destroy()
 
     def open_settings(self):
         MainSettingsDialog(self)
 
     def on_compression_change(self, choice):
-        vals = [cfg.get_text("comp_mode_lossless"), cfg.get_text("comp_mode_compressed")]
+        vals = [cfg.get_text("comp_mode_lossless"), cfg.get_text("comp_mode_compressed"), cfg.get_text("comp_mode_rebuild")]
         try:
             self.compression_mode_index = vals.index(choice)
         except:
@@ -501,13 +685,14 @@ class PrinterApp(ctk.CTk):
         self.lbl_actions.configure(text=cfg.get_text("lbl_actions"))
         self.lbl_rotate.configure(text=cfg.get_text("lbl_rotate"))
         self.lbl_hint.configure(text=cfg.get_text("lbl_hint"))
+        if self.pages: self.show_cache_stats()
         
-        if not self.pages_order:
+        if not self.pages:
             self.lbl_status.configure(text=cfg.get_text("status_ready"))
         else:
-            self.lbl_status.configure(text=cfg.get_text("status_loaded").format(len(self.pages_order)))
+            self.lbl_status.configure(text=cfg.get_text("status_loaded").format(len(self.pages)))
         
-        vals = [cfg.get_text("comp_mode_lossless"), cfg.get_text("comp_mode_compressed")]
+        vals = [cfg.get_text("comp_mode_lossless"), cfg.get_text("comp_mode_compressed"), cfg.get_text("comp_mode_rebuild")]
         self.cmb_compression.configure(values=vals)
         self.compression_var.set(vals[self.compression_mode_index])
 
@@ -519,24 +704,38 @@ class PrinterApp(ctk.CTk):
             (cfg.get_text("file_img"), img_exts)
         ]
 
-    def _load_doc_safely(self, path):
-        try:
-            doc = fitz.open(path)
-            if doc.is_pdf: return doc
-            pdf_bytes = doc.convert_to_pdf()
-            pdf_doc = fitz.open("pdf", pdf_bytes)
-            doc.close()
-            return pdf_doc
-        except Exception as e:
-            raise Exception(f"Error {path}: {e}")
+    def _temp_folder(self):
+        if self.temp_dir is None:
+            self.temp_dir = tempfile.mkdtemp(prefix="rePagePDF_")
+        return self.temp_dir
+
+    def _temp_pdf_path(self):
+        fd, path = tempfile.mkstemp(suffix=".pdf", dir=self._temp_folder())
+        os.close(fd)
+        return path
 
     def update_zoom_ui(self):
         self.slider_zoom.set(self.zoom_scale)
-        cfg.set_setting("zoom", self.zoom_scale)
-        self.refresh_grid()
+        self.schedule_zoom()
 
     def slider_event(self, value):
         self.zoom_scale = float(value)
+        self.schedule_zoom()
+
+    def schedule_zoom(self):
+        if self.zoom_job: self.after_cancel(self.zoom_job)
+        self.zoom_job = self.after(self.zoom_debounce, self.apply_zoom)
+        for btn in self.grid_buttons.values():
+            ctk_img = self.scaled_thumbnail(btn.thumb_key[:2] + (round(self.zoom_scale, 3),))
+            if ctk_img is None: continue
+            img_w, img_h = ctk_img.cget("size")
+            btn.configure(image=ctk_img, width=img_w, height=img_h + 30)
+
+    def apply_zoom(self):
+        if self.job:
+            self.zoom_job = self.after(self.zoom_debounce, self.apply_zoom)
+            return
+        self.zoom_job = None
         cfg.set_setting("zoom", self.zoom_scale)
         self.refresh_grid()
 
@@ -555,145 +754,344 @@ class PrinterApp(ctk.CTk):
         elif event.num == 4 or event.delta > 0: self.zoom_in()
 
     def open_file(self):
+        if self.job: return
         initial_dir = cfg.get_setting("last_dir", "")
         paths = filedialog.askopenfilenames(filetypes=self._get_file_types(), initialdir=initial_dir)
         if not paths: return
         
         cfg.set_setting("last_dir", os.path.dirname(paths[0]))
-        
-        p_window, p_bar, p_lbl, p_perc = self.create_progress_window(cfg.get_text("window_title"))
-        self.update()
-        
-        try:
-            if self.doc: self.doc.close()
-            self.doc = fitz.open()
-            
-            for i, path in enumerate(paths):
-                sub_doc = self._load_doc_safely(path)
-                self.doc.insert_pdf(sub_doc)
-                sub_doc.close()
-                p_bar.set((i + 1) / len(paths) * 0.2)
-                self.update()
+        self.start_engine()
+        temp_dir, workers = self._temp_folder(), int(cfg.get_setting("load_workers", engine.default_workers()))
+
+        def work(job):
+            doc = engine.VirtualDocument()
+            try:
+                _, errors = doc.add_files(paths, temp_dir, lambda c, t: job.progress(c / t), workers)
+                doc.max_page_size()
+            except BaseException:
+                doc.close()
+                raise
+            return doc, errors
+
+        def done(result):
+            doc, errors = result
+            self.show_load_errors(errors)
+            if not len(doc):
+                doc.close()
+                return
+            if self.doc is not None: self.doc.close()
+            self.doc = doc
+            self.reset_thumbnails()
             
-            self.pages_order = list(range(len(self.doc)))
-            self.page_rotations = {i: 0 for i in range(len(self.doc))}
+            self.pages = self.doc.pages
             self.selected_indices.clear()
             self.last_selected_index = None
+            self.undo_stack.clear()
+            self.redo_stack.clear()
             
             self.btn_save.configure(state="normal")
             self.btn_add.configure(state="normal")
-            if self.pages_order:
+            if self.pages:
                 self.btn_select_all_ui.configure(state="normal")
                 self.btn_booklet.configure(state="normal")
             
-            self.refresh_grid(lambda c, t: self.update_prog(p_bar, p_lbl, p_perc, c, t))
-            self.lbl_status.configure(text=cfg.get_text("status_loaded").format(len(self.pages_order)))
-            
-        except Exception as e:
-            messagebox.showerror(cfg.get_text("status_error"), str(e))
-        finally:
+            self.refresh_grid()
+            self.lbl_status.configure(text=cfg.get_text("status_loaded").format(len(self.pages)))
+
+        self.run_job("open", cfg.get_text("window_title"), work, done)
+
+    def show_load_errors(self, errors):
+        if not errors: return
+        details = "\n".join(f"{os.path.basename(path)}: {e}" for path, e in errors)
+        messagebox.showerror(cfg.get_text("status_error"), f"{cfg.get_text('err_files_skipped')}\n\n{details}")
+
+    def run_job(self, name, title, work, on_done):
+        self.job = Job(work, name).start()
+        self.job_window = self.create_progress_window(title, self.job.cancel)
+        self.after(50, self.poll_job, on_done)
+
+    def poll_job(self, on_done):
+        p_window, p_bar, p_lbl, p_perc = self.job_window
+        for kind, value, info in self.job.poll():
+            if kind == "progress":
+                p_bar.set(value)
+                p_perc.configure(text=f"{int(value * 100)}%")
+                if info: p_lbl.configure(text=info)
+                continue
+            self.job = None
             p_window.destroy()
-
-    def update_prog(self, bar, lbl, perc, curr, total):
-        prog = 0.2 + (curr / total) * 0.8
-        bar.set(prog)
-        lbl.configure(text=cfg.get_text("lbl_preview").format(curr, total))
-        perc.configure(text=f"{int(prog * 100)}%")
-        self.update()
+            tracing.export(self.trace_dir)
+            if isinstance(info, Cancelled): self.lbl_status.configure(text=cfg.get_text("status_cancelled"))
+            elif info is not None: messagebox.showerror(cfg.get_text("status_error"), str(info))
+            else:
+                try: on_done(value)
+                except Exception as e: messagebox.showerror(cfg.get_text("status_error"), str(e))
+            self.update_viewport()
+            return
+        self.after(50, self.poll_job, on_done)
 
     def add_file(self):
+        if self.job: return
         if self.doc is None: return self.open_file()
         paths = filedialog.askopenfilenames(filetypes=self._get_file_types(), initialdir=cfg.get_setting("last_dir"))
         if not paths: return
+        temp_dir, workers = self._temp_folder(), int(cfg.get_setting("load_workers", engine.default_workers()))
 
-        p_window, p_bar, p_lbl, p_perc = self.create_progress_window(cfg.get_text("btn_add"))
-        try:
-            start_idx = len(self.doc)
-            for i, path in enumerate(paths):
-                sub = self._load_doc_safely(path)
-                self.doc.insert_pdf(sub)
-                sub.close()
-                p_bar.set((i+1)/len(paths)*0.2)
-                self.update()
+        def done(result):
+            new_indices, errors = result
+            self.show_load_errors(errors)
+            if new_indices: self.push_undo(before)
             
-            new_indices = list(range(start_idx, len(self.doc)))
-            self.pages_order.extend(new_indices)
-            for i in new_indices: self.page_rotations[i] = 0
-            
-            self.refresh_grid(lambda c, t: self.update_prog(p_bar, p_lbl, p_perc, c, t))
-            self.lbl_status.configure(text=cfg.get_text("status_loaded").format(len(self.pages_order)))
-        except Exception as e:
-            messagebox.showerror(cfg.get_text("status_error"), str(e))
-        finally:
-            p_window.destroy()
+            self.refresh_grid()
+            self.lbl_status.configure(text=cfg.get_text("status_loaded").format(len(self.pages)))
+
+        doc, before = self.doc, (self.pages.snapshot(), self.selected_indices.copy())
+        def work(job):
+            result = doc.add_files(paths, temp_dir, lambda c, t: job.progress(c / t), workers)
+            doc.max_page_size()
+            return result
+
+        self.run_job("add", cfg.get_text("btn_add"), work, done)
 
-    def refresh_grid(self, progress_callback=None):
-        for btn in self.buttons_list: btn.destroy()
-        self.buttons_list = []
+    def refresh_grid(self):
+        for btn in self.grid_buttons.values():
+            btn.grid_forget()
+            self.button_pool.append(btn)
+        self.grid_buttons = {}
+        self.grid_rows = 0
 
-        if not self.pages_order: return
+        if not self.pages: return
 
         area_width = self.grid_area.winfo_width()
         if area_width < 100: area_width = 800
         
         try:
-            p0 = self.doc.load_page(self.pages_order[0])
-            w0 = p0.rect.width if self.page_rotations.get(self.pages_order[0],0)%180==0 else p0.rect.height
-        except: w0 = 595
+            w0, h0 = self.doc.max_page_size()
+        except: w0, h0 = 595, 842
+        self.grid_page_size = (w0, h0)
         
         scaled_w = w0 * self.zoom_scale
         cols = max(1, int((area_width-30) // (scaled_w+30)))
+        self.grid_cols = cols
+        self.grid_rows = (len(self.pages) + cols - 1) // cols
         
-        self.grid_area.grid_columnconfigure(list(range(cols)), weight=1)
-        self.grid_area.grid_columnconfigure(list(range(cols, 20)), weight=0)
-
-        matrix = fitz.Matrix(self.zoom_scale, self.zoom_scale)
-        total = len(self.pages_order)
-
-        for idx, original_idx in enumerate(self.pages_order):
-            if progress_callback: progress_callback(idx + 1, total)
+        self.grid_area.layout(cols, self.grid_rows, int(h0 * self.zoom_scale) + 50)
+        self.grid_area.update_idletasks()
+
+        placeholder = Image.new("RGB", (max(1, int(w0 * self.zoom_scale)), max(1, int(h0 * self.zoom_scale))), "gray80")
+        self.placeholder = ctk.CTkImage(light_image=placeholder, dark_image=placeholder, size=placeholder.size)
+        with tracing.span("refresh_grid", pages=len(self.pages), cols=cols) as info:
+            self.update_viewport()
+            info["thumb_cache"] = self.thumb_cache.stats()
+        self.show_cache_stats()
+
+    def show_cache_stats(self):
+        cache = self.thumb_cache
+        self.lbl_cache.configure(text=cfg.get_text("status_cache").format(len(cache.entries), cache.hits, cache.misses, cache.size / 1048576))
+
+    def on_grid_scroll(self, first, last):
+        self.grid_scrollbar.set(first, last)
+        if not self.viewport_pending:
+            self.viewport_pending = True
+            self.after_idle(self.update_viewport)
+
+    def update_viewport(self):
+        self.viewport_pending = False
+        if not self.grid_rows: return
+
+        canvas = self.grid_canvas
+        top_row = self.grid_area.grid_location(0, canvas.canvasy(0))[1]
+        bottom_row = self.grid_area.grid_location(0, canvas.canvasy(canvas.winfo_height()))[1]
+        first_row = max(0, top_row - self.grid_overscan)
+        last_row = min(self.grid_rows - 1, max(top_row, bottom_row) + self.grid_overscan)
+        wanted = range(first_row * self.grid_cols, min(len(self.pages), (last_row + 1) * self.grid_cols))
+        in_view = range(top_row * self.grid_cols, (max(top_row, bottom_row) + 1) * self.grid_cols)
+
+        for pos in [p for p in self.grid_buttons if p not in wanted]:
+            btn = self.grid_buttons.pop(pos)
+            btn.grid_forget()
+            self.button_pool.append(btn)
+
+        new = [p for p in wanted if p not in self.grid_buttons]
+        for pos in new:
+            try: self.show_page_button(pos)
+            except Exception as e: tracing.error("show_page", e, pos=pos)
+
+        if new: self.update_visuals()
+
+        if self.renderer:
+            zoom = round(self.zoom_scale, 3)
+            keys = []
+            for pos in sorted(wanted, key=lambda p: p not in in_view):
+                sid, pno, rotation = self.pages[pos]
+                key = ((sid, pno), rotation, zoom)
+                if self.grid_buttons.get(pos) is not None and self.grid_buttons[pos].thumb_key == key and not self.grid_buttons[pos].thumb_ready:
+                    keys.append(key)
+            keys = dict.fromkeys(keys)
+            self.renderer.cancel_except(keys)
+            for key in keys:
+                (sid, pno), rotation, zoom = key
+                self.renderer.submit(key, self.doc.sources[sid].path, pno, rotation, zoom)
+            if self.renderer.busy() and not self.render_polling:
+                self.render_polling = True
+                self.after(30, self.poll_renderer)
+        elif not self.job:
+            for btn in [b for b in self.grid_buttons.values() if not b.thumb_ready]:
+                try: ctk_img = self.get_thumbnail(btn.thumb_key)
+                except Exception as e:
+                    tracing.error("show_page", e, pos=btn.page_pos)
+                    continue
+                img_w, img_h = ctk_img.cget("size")
+                btn.configure(image=ctk_img, width=img_w, height=img_h + 30)
+                btn.thumb_ready = True
+
+    def poll_renderer(self):
+        for key, result, error in self.renderer.poll():
+            if error is not None:
+                tracing.error("render_page", error, page=key[0], rotation=key[1], zoom=key[2])
+                continue
+            width, height, samples, _ = result
+            img = Image.frombytes("RGB", [width, height], samples)
+            ctk_img = ctk.CTkImage(light_image=img, dark_image=img, size=(width, height))
+            self.thumb_cache.put(key, ctk_img, len(samples))
+            if self.zoom_job: continue
+            for btn in self.grid_buttons.values():
+                if btn.thumb_key == key:
+                    btn.configure(image=ctk_img, width=width, height=height + 30)
+                    btn.thumb_ready = True
+        if self.renderer.busy(): self.after(30, self.poll_renderer)
+        else:
+            self.render_polling = False
+            self.show_cache_stats()
+
+    def thumb_key(self, pos):
+        sid, pno, rotation = self.pages[pos]
+        return ((sid, pno), rotation, round(self.zoom_scale, 3))
+
+    def thumb_image(self, key):
+        if not self.renderer and not self.job: return self.get_thumbnail(key), True
+        ctk_img = self.thumb_cache.get(key)
+        if ctk_img is None: return self.scaled_thumbnail(key) or self.placeholder, False
+        return ctk_img, True
+
+    def scaled_thumbnail(self, key):
+        nearest = self.thumb_cache.nearest(key[:2], key[2])
+        if nearest is None: return None
+        level, ctk_img = nearest
+        img_w, img_h = ctk_img.cget("size")
+        size = (max(1, round(img_w * key[2] / level)), max(1, round(img_h * key[2] / level)))
+        img = ctk_img.cget("light_image")
+        return ctk.CTkImage(light_image=img, dark_image=img, size=size)
+
+    def show_page_button(self, pos):
+        key = self.thumb_key(pos)
+        ctk_img, ready = self.thumb_image(key)
+        img_w, img_h = ctk_img.cget("size")
+
+        if self.button_pool:
+            btn = self.button_pool.pop()
+            btn.configure(image=ctk_img, text=f"{pos+1}", width=img_w, height=img_h + 30)
+        elif self.canvas_grid:
+            btn = self.grid_area.cell()
+            btn.configure(image=ctk_img, text=f"{pos+1}", width=img_w, height=img_h + 30)
+            btn.visual = "normal"
+        else:
+            btn = self.grid_area.cell(ctk.CTkButton(self.grid_canvas, image=ctk_img, text=f"{pos+1}", compound="top",
+                                                    fg_color="transparent", bg_color=self.grid_area.cget("fg_color"),
+                                                    border_width=0, border_color="orange", width=img_w, height=img_h + 30))
+            
+            btn.visual = "normal"
+            btn.bind("<Button-1>", lambda e, b=btn: self.on_press(e, b.page_pos))
+            btn.bind("<B1-Motion>", self.on_drag_motion)
+            btn.bind("<ButtonRelease-1>", self.on_release)
+        
+        btn.page_pos = pos
+        btn.thumb_key, btn.thumb_ready = key, ready
+        btn.grid(row=pos//self.grid_cols, column=pos%self.grid_cols, padx=10, pady=10)
+        self.grid_buttons[pos] = btn
+
+    def reset_thumbnails(self):
+        self.thumb_cache.clear()
+        if self.renderer: self.renderer.reset()
+
+    def sync_grid(self, deleted=()):
+        if not self.pages or self.doc.max_page_size() != self.grid_page_size: return self.refresh_grid()
+
+        rows = (len(self.pages) + self.grid_cols - 1) // self.grid_cols
+        self.grid_area.layout(self.grid_cols, rows)
+        self.grid_rows = rows
+
+        old = self.grid_buttons
+        by_page = {}
+        for btn in old.values(): by_page.setdefault(btn.thumb_key[0], []).append(btn)
+        self.grid_buttons = {}
+        span = range(min(old), min(len(self.pages), max(old) + 1)) if old else range(0)
+        for pos in span:
+            key = self.thumb_key(pos)
+            btn = by_page[key[0]].pop() if by_page.get(key[0]) else None
+            if btn is None: continue
+            if btn.page_pos != pos:
+                btn.grid(row=pos//self.grid_cols, column=pos%self.grid_cols)
+                btn.configure(text=f"{pos+1}")
+                btn.page_pos = pos
+            if key != btn.thumb_key:
+                ctk_img, ready = self.thumb_image(key)
+                img_w, img_h = ctk_img.cget("size")
+                btn.configure(image=ctk_img, width=img_w, height=img_h + 30)
+                btn.thumb_key, btn.thumb_ready = key, ready
+            self.grid_buttons[pos] = btn
+
+        deleted = set(deleted)
+        for page, buttons in by_page.items():
+            for btn in buttons:
+                if page in deleted:
+                    btn.destroy()
+                else:
+                    btn.grid_forget()
+                    self.button_pool.append(btn)
+
+        self.update_viewport()
+        self.update_visuals()
 
-            try:
-                page = self.doc.load_page(original_idx)
-                page.set_rotation(self.page_rotations.get(original_idx, 0))
-                pix = page.get_pixmap(matrix=matrix)
+    def get_thumbnail(self, key):
+        ctk_img = self.thumb_cache.get(key)
+        if ctk_img is None:
+            (sid, page_no), rotation, zoom = key
+            source = self.doc.sources[sid]
+            disk_cache = self.disk_cache if source.path else None
+            img = disk_cache.get(source.path, page_no, rotation, zoom) if disk_cache else None
+            if img is None:
+                with tracing.span("render_page", page=key[0], rotation=rotation, zoom=zoom):
+                    doc, pno = source.locate(page_no)
+                    pix = doc.load_page(pno).get_pixmap(matrix=fitz.Matrix(zoom, zoom).prerotate(rotation))
                 img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
-                ctk_img = ctk.CTkImage(light_image=img, dark_image=img, size=(pix.width, pix.height))
-
-                btn = ctk.CTkButton(self.grid_area, image=ctk_img, text=f"{idx+1}", compound="top",
-                                    fg_color="transparent", border_width=0, border_color="orange",
-                                    width=pix.width, height=pix.height + 30)
-                
-                btn.bind("<Button-1>", lambda e, i=idx: self.on_press(e, i))
-                btn.bind("<B1-Motion>", self.on_drag_motion)
-                btn.bind("<ButtonRelease-1>", self.on_release)
-                
-                btn.grid(row=idx//cols, column=idx%cols, padx=10, pady=10)
-                self.buttons_list.append(btn)
-            except Exception as e: print(f"Err pg {idx}: {e}")
-
-        self.update_visuals()
+                if disk_cache: disk_cache.put(source.path, page_no, rotation, zoom, img)
+            ctk_img = ctk.CTkImage(light_image=img, dark_image=img, size=img.size)
+            self.thumb_cache.put(key, ctk_img, img.width * img.height * 3)
+        return ctk_img
 
     def update_visuals(self):
-        for i, btn in enumerate(self.buttons_list):
-            if self.drag_data["active"] and i == self.drag_data["target_index"]:
+        target = self.drag_data["target_index"] if self.drag_data["active"] else None
+        for i, btn in self.grid_buttons.items():
+            visual = "target" if i == target else "selected" if i in self.selected_indices else "normal"
+            if btn.visual == visual: continue
+            btn.visual = visual
+            if visual == "target":
                 btn.configure(border_color="#1F6AA5", border_width=4)
-            elif i in self.selected_indices:
+            elif visual == "selected":
                 btn.configure(fg_color="orange", border_color="orange", border_width=3)
             else:
                 btn.configure(fg_color="transparent", border_color="orange", border_width=0)
         
         state = "normal" if self.selected_indices else "disabled"
-        self.btn_up.configure(state=state)
-        self.btn_down.configure(state=state)
-        self.btn_delete.configure(state=state)
-        self.btn_rot_ccw.configure(state=state)
-        self.btn_rot_cw.configure(state=state)
-        self.btn_rot_180.configure(state=state)
+        if state == self.actions_state: return
+        self.actions_state = state
+        for btn in (self.btn_up, self.btn_down, self.btn_delete, self.btn_rot_ccw, self.btn_rot_cw, self.btn_rot_180):
+            btn.configure(state=state)
 
     def select_all(self, event=None):
-        if not self.pages_order: return
-        self.selected_indices = set(range(len(self.pages_order)))
+        if not self.pages: return
+        self.selected_indices = Selection([(0, len(self.pages))])
         self.update_visuals()
 
     def on_press(self, event, index):
@@ -710,14 +1108,14 @@ class PrinterApp(ctk.CTk):
         if is_shift and self.last_selected_index is not None:
             s, e = min(self.last_selected_index, index), max(self.last_selected_index, index)
             if not is_ctrl: self.selected_indices.clear()
-            self.selected_indices.update(range(s, e + 1))
+            self.selected_indices.add(s, e + 1)
         elif is_ctrl:
             if index in self.selected_indices: self.selected_indices.remove(index)
             else: 
                 self.selected_indices.add(index)
                 self.last_selected_index = index
         else:
-            self.selected_indices = {index}
+            self.selected_indices = Selection([(index, index + 1)])
             self.last_selected_index = index
         self.update_visuals()
 
@@ -727,15 +1125,7 @@ class PrinterApp(ctk.CTk):
                 self.drag_data["active"] = True
         
         if self.drag_data["active"]:
-            widget = self.winfo_containing(*self.winfo_pointerxy())
-            target = None
-            curr = widget
-            while curr:
-                if curr in self.buttons_list:
-                    target = self.buttons_list.index(curr)
-                    break
-                curr = curr.master
-            
+            target = self.position_at(*self.winfo_pointerxy())
             if target is not None and target != self.drag_data["target_index"]:
                 self.drag_data["target_index"] = target
                 self.update_visuals()
@@ -745,12 +1135,32 @@ class PrinterApp(ctk.CTk):
             elif y_root > self.scroll_sensor_bottom.winfo_rooty(): self._do_autoscroll(0.005)
             else: self.autoscroll_active = False
 
+    def on_canvas_press(self, event):
+        pos = self.position_at(event.x_root, event.y_root)
+        self.canvas_pressed = pos is not None
+        if self.canvas_pressed: self.on_press(event, pos)
+
+    def on_canvas_motion(self, event):
+        if self.canvas_pressed: self.on_drag_motion(event)
+
+    def on_canvas_release(self, event):
+        if self.canvas_pressed: self.on_release(event)
+        self.canvas_pressed = False
+
+    def position_at(self, x_root, y_root):
+        canvas = self.grid_canvas
+        col, row = self.grid_area.grid_location(canvas.canvasx(x_root - canvas.winfo_rootx()), canvas.canvasy(y_root - canvas.winfo_rooty()))
+        pos = row * self.grid_cols + col
+        if 0 <= col < self.grid_cols and 0 <= row < self.grid_rows and pos < len(self.pages): return pos
+        return None
+
     def _do_autoscroll(self, speed):
         if not self.autoscroll_active:
             self.autoscroll_active = True
             def scroll():
                 if not self.autoscroll_active: return
-                self.grid_area._parent_canvas.yview_scroll(int(speed*100), "units")
+                step = max(1, round(20 / max(1, int(self.grid_canvas.cget("yscrollincrement")))))
+                self.grid_canvas.yview_scroll(-step if speed < 0 else step, "units")
                 self.after(20, scroll)
             scroll()
 
@@ -759,7 +1169,7 @@ class PrinterApp(ctk.CTk):
         if self.drag_data["active"] and self.drag_data["target_index"] is not None:
             self.execute_drag_move(self.drag_data["target_index"])
         elif self.drag_data["pending_select"] is not None:
-            self.selected_indices = {self.drag_data["pending_select"]}
+            self.selected_indices = Selection([(self.drag_data["pending_select"], self.drag_data["pending_select"] + 1)])
             self.last_selected_index = self.drag_data["pending_select"]
         
         self.drag_data["active"] = False
@@ -767,46 +1177,71 @@ class PrinterApp(ctk.CTk):
         self.update_visuals()
 
     def execute_drag_move(self, target):
-        moving = sorted(list(self.selected_indices))
-        data_to_move = [self.pages_order[i] for i in moving]
-        
-        for i in sorted(moving, reverse=True): del self.pages_order[i]
+        if self.job or not self.selected_indices: return
+        moving = list(self.selected_indices)
+        self.push_undo()
         
         shift = sum(1 for x in moving if x < target)
-        new_pos = max(0, min(len(self.pages_order), target - shift + (1 if target > moving[0] else 0)))
+        new_pos = max(0, min(len(self.pages) - len(moving), target - shift + (1 if target > moving[0] else 0)))
         
-        for item in reversed(data_to_move): self.pages_order.insert(new_pos, item)
-        self.selected_indices = set(range(new_pos, new_pos + len(data_to_move)))
-        self.refresh_grid()
+        self.pages.move(moving, new_pos)
+        self.selected_indices = Selection([(new_pos, new_pos + len(moving))])
+        self.sync_grid()
 
     def move_pages_btn(self, direction):
-        if not self.selected_indices: return
-        indices = sorted(list(self.selected_indices), reverse=(direction > 0))
-        if (direction == -1 and indices[-1] == 0) or (direction == 1 and indices[0] == len(self.pages_order)-1): return
+        if self.job or not self.selected_indices: return
+        indices = list(self.selected_indices)
+        if (direction == -1 and indices[0] == 0) or (direction == 1 and indices[-1] == len(self.pages)-1): return
+        self.push_undo()
 
-        new_sel = set()
-        for idx in indices:
+        rows = {}
+        for idx in (reversed(indices) if direction > 0 else indices):
             tgt = idx + direction
-            self.pages_order[idx], self.pages_order[tgt] = self.pages_order[tgt], self.pages_order[idx]
-            new_sel.add(tgt)
-        self.selected_indices = new_sel
-        self.refresh_grid()
+            rows[idx], rows[tgt] = rows.get(tgt, self.pages[tgt]), rows.get(idx, self.pages[idx])
+        self.pages.replace(list(rows), list(rows.values()))
+        self.selected_indices = self.selected_indices.shifted(direction)
+        self.sync_grid()
 
     def delete_pages(self):
-        for i in sorted(list(self.selected_indices), reverse=True): del self.pages_order[i]
+        if self.job or not self.selected_indices: return
+        self.push_undo()
+        positions = list(self.selected_indices)
+        deleted = {self.pages[i][:2] for i in positions}
+        self.pages.delete(positions)
         self.selected_indices.clear()
-        self.refresh_grid()
-        self.lbl_status.configure(text=cfg.get_text("status_loaded").format(len(self.pages_order)))
+        self.sync_grid(deleted)
+        self.lbl_status.configure(text=cfg.get_text("status_loaded").format(len(self.pages)))
 
     def rotate_pages(self, angle):
-        for idx in self.selected_indices:
-            real_pg = self.pages_order[idx]
-            self.page_rotations[real_pg] = (self.page_rotations[real_pg] + angle) % 360
-        self.refresh_grid()
+        if self.job or not self.selected_indices: return
+        self.push_undo()
+        self.pages.rotate(self.selected_indices, angle)
+        self.sync_grid()
+
+    def push_undo(self, state=None):
+        self.undo_stack.append(state or (self.pages.snapshot(), self.selected_indices.copy()))
+        del self.undo_stack[:-self.undo_limit]
+        self.redo_stack.clear()
+
+    def undo(self, event=None):
+        self.step_history(self.undo_stack, self.redo_stack)
+
+    def redo(self, event=None):
+        self.step_history(self.redo_stack, self.undo_stack)
+
+    def step_history(self, source, target):
+        if self.job or not source: return
+        target.append((self.pages.snapshot(), self.selected_indices.copy()))
+        snapshot, selection = source.pop()
+        self.pages.restore(snapshot)
+        self.selected_indices = selection
+        self.last_selected_index = None
+        self.sync_grid()
+        self.lbl_status.configure(text=cfg.get_text("status_loaded").format(len(self.pages)))
 
     def create_booklet(self):
-        if not self.pages_order: return
-        dialog = BookletOptionsDialog(self, len(self.pages_order))
+        if self.job or not self.pages: return
+        dialog = BookletOptionsDialog(self, len(self.pages))
         self.wait_window(dialog)
         if not dialog.result: return
         
@@ -816,74 +1251,38 @@ class PrinterApp(ctk.CTk):
             save_path = filedialog.asksaveasfilename(defaultextension=".pdf", filetypes=[(cfg.get_text("file_pdf"), "*.pdf")])
             if not save_path: return
 
-        p_window, p_bar, p_lbl, p_perc = self.create_progress_window(cfg.get_text("btn_booklet"))
-        try:
-            temp = fitz.open()
-            for idx in self.pages_order:
-                temp.insert_pdf(self.doc, from_page=idx, to_page=idx)
-                if self.page_rotations[idx] != 0: temp[-1].set_rotation(self.page_rotations[idx])
-            
-            sheet_w, sheet_h = (841.89, 595.28) if sets['format'] == "A4" else (792.0, 612.0)
-            is_rtl = (sets['direction'] == "RTL")
-            total_pg = len(temp)
-            chunk = sets['sheets_per_sig'] * 4 if sets['use_signatures'] else (total_pg + (4 - total_pg % 4) if total_pg % 4 else total_pg)
-            if chunk == 0: chunk = 4
-            
-            final_doc = fitz.open()
-            
-            for start in range(0, total_pg, chunk):
-                end = min(start + chunk, total_pg)
-                sig_doc = fitz.open()
-                sub = list(range(start, end))
-                while len(sub) % 4 != 0: sub.append(None)
-                
-                queue = sub.copy()
-                while queue:
-                    pg = sig_doc.new_page(width=sheet_w, height=sheet_h)
-                    r_left = fitz.Rect(0, 0, sheet_w/2, sheet_h)
-                    r_right = fitz.Rect(sheet_w/2, 0, sheet_w, sheet_h)
-                    
-                    p1, p4 = queue.pop(0), queue.pop(-1)
-                    if is_rtl: p1, p4 = p4, p1 
-
-                    if p4 is not None: pg.show_pdf_page(r_left, temp, p4, keep_proportion=True)
-                    if p1 is not None: pg.show_pdf_page(r_right, temp, p1, keep_proportion=True)
-                    
-                    if not queue: break
-                    
-                    pg_back = sig_doc.new_page(width=sheet_w, height=sheet_h)
-                    p2, p3 = queue.pop(0), queue.pop(-1)
-                    if is_rtl: p2, p3 = p3, p2
-                    
-                    if p2 is not None: pg_back.show_pdf_page(r_left, temp, p2, keep_proportion=True)
-                    if p3 is not None: pg_back.show_pdf_page(r_right, temp, p3, keep_proportion=True)
-
-                if sets['use_signatures'] and save_path:
-                    rt, ex = os.path.splitext(save_path)
-                    sig_doc.save(f"{rt}_part_{(start//chunk)+1}{ex}")
-                
-                final_doc.insert_pdf(sig_doc)
-                sig_doc.close()
-                p_bar.set(end/total_pg)
-                self.update()
-
-            temp.close()
-            if self.doc: self.doc.close()
-            self.doc = final_doc
-            self.pages_order = list(range(len(self.doc)))
-            self.page_rotations = {i: 0 for i in range(len(self.doc))}
-            self.selected_indices.clear()
-            self.refresh_grid()
+        doc, order, booklet_path = self.doc, list(range(len(self.pages))), self._temp_pdf_path()
+        workers = int(cfg.get_setting("booklet_workers", engine.default_workers()))
+
+        def work(job):
+            final_doc = engine.make_booklet(doc, order, sets['format'], sets['direction'],
+                                            sets['sheets_per_sig'] if sets['use_signatures'] else None, save_path,
+                                            lambda c, t: job.progress(c / t), workers, not sets['parts_only'])
+            if final_doc is None: return None
+            try:
+                final_doc.save(booklet_path)
+                return len(final_doc)
+            finally: final_doc.close()
+
+        def done(page_count):
+            if page_count is not None:
+                booklet = engine.VirtualDocument()
+                booklet.add_pages(booklet.add_source(booklet_path, page_count), range(page_count))
+                self.doc.close()
+                self.doc = booklet
+                self.reset_thumbnails()
+                self.pages = self.doc.pages
+                self.selected_indices.clear()
+                self.undo_stack.clear()
+                self.redo_stack.clear()
+                self.refresh_grid()
             messagebox.showinfo(cfg.get_text("msg_success"), cfg.get_text("msg_done"))
 
-        except Exception as e:
-            messagebox.showerror(cfg.get_text("status_error"), str(e))
-        finally:
-            p_window.destroy()
+        self.run_job("create_booklet", cfg.get_text("btn_booklet"), work, done)
 
     def save_file(self):
-        if not self.pages_order: return
-        comp_sets = {"quality": 70, "max_res": 1200}
+        if self.job or not self.pages: return
+        comp_sets = {"quality": 70, "max_res": 1200, "target_dpi": None, "min_saving": 10}
         if self.compression_mode_index == 1:
             dlg = CompressionSettingsDialog(self)
             self.wait_window(dlg)
@@ -893,58 +1292,57 @@ class PrinterApp(ctk.CTk):
         path = filedialog.asksaveasfilename(defaultextension=".pdf", filetypes=[(cfg.get_text("file_pdf"), "*.pdf")])
         if not path: return
 
-        p_window, p_bar, p_lbl, p_perc = self.create_progress_window(cfg.get_text("btn_save"))
-        try:
-            out = fitz.open()
-            for i, idx in enumerate(self.pages_order):
-                out.insert_pdf(self.doc, from_page=idx, to_page=idx)
-                if self.page_rotations[idx]: out[-1].set_rotation(self.page_rotations[idx])
-                p_bar.set((i+1)/len(self.pages_order)*0.5)
-                self.update()
-
-            if self.compression_mode_index == 1:
-                processed = set()
-                for pg in out:
-                    for img in pg.get_images():
-                        xref = img[0]
-                        if xref in processed: continue
-                        processed.add(xref)
-                        try:
-                            pix = fitz.Pixmap(out, xref)
-                            if pix.width > comp_sets['max_res'] or pix.height > comp_sets['max_res']:
-                                if pix.n > 3: pix = fitz.Pixmap(fitz.csRGB, pix)
-                                ratio = comp_sets['max_res'] / max(pix.width, pix.height)
-                                new_w, new_h = int(pix.width*ratio), int(pix.height*ratio)
-                                pil = Image.open(io.BytesIO(pix.tobytes("png"))).resize((new_w, new_h), Image.LANCZOS)
-                                buf = io.BytesIO()
-                                pil.save(buf, format="JPEG", quality=comp_sets['quality'])
-                                pg.replace_image(xref, stream=buf.getvalue())
-                        except: pass
-            
-            p_lbl.configure(text=cfg.get_text("lbl_saving"))
-            out.save(path, garbage=4, deflate=True)
-            out.close()
+        doc, order, compress = self.doc, list(range(len(self.pages))), self.compression_mode_index == 1
+        incremental = self.compression_mode_index == 0
+        state = self.pages.snapshot()
+        workers = int(cfg.get_setting("compress_workers", engine.default_workers()))
+
+        def work(job):
+            if incremental and engine.save_incremental(doc, order, path): return
+            with engine.save_target(doc, path) as target:
+                out = engine.assemble(doc, order, lambda c, t: job.progress(c / t * 0.5))
+                try:
+                    if compress:
+                        engine.compress_images(out, comp_sets['quality'], comp_sets['max_res'],
+                                               lambda c, t: job.progress(0.5 + c / t * 0.5, cfg.get_text("lbl_compressing").format(c, t)),
+                                               workers, comp_sets['target_dpi'], comp_sets['min_saving'])
+                    job.progress(1, cfg.get_text("lbl_saving"))
+                    engine.save_pdf(out, target)
+                finally: out.close()
+            doc.adopt(path, order)
+
+        def done(_):
+            if self.pages.snapshot() is not state:
+                self.reset_thumbnails()
+                self.undo_stack.clear()
+                self.redo_stack.clear()
+                self.refresh_grid()
             messagebox.showinfo(cfg.get_text("msg_success"), cfg.get_text("msg_saved"))
-            
-        except Exception as e:
-            messagebox.showerror(cfg.get_text("status_error"), str(e))
-        finally:
-            p_window.destroy()
 
-    def create_progress_window(self, title):
+        self.run_job("save_file", cfg.get_text("btn_save"), work, done)
+
+    def create_progress_window(self, title, on_cancel):
         w = ctk.CTkToplevel(self)
         w.title(title)
-        w.geometry("300x150")
+        w.geometry("300x190")
         w.transient(self)
-        w.grab_set()
         ctk.CTkLabel(w, text=cfg.get_text("lbl_wait"), font=("Arial", 14)).pack(pady=(20, 10))
         bar = ctk.CTkProgressBar(w, width=250)
         bar.pack(pady=10)
         bar.set(0)
         perc = ctk.CTkLabel(w, text="0%", text_color="gray")
         perc.pack(pady=5)
+
+        def cancel():
+            on_cancel()
+            btn.configure(state="disabled")
+
+        btn = ctk.CTkButton(w, text=cfg.get_text("btn_cancel"), fg_color="transparent", border_width=1, height=28, command=cancel)
+        btn.pack(pady=(5, 10))
+        w.protocol("WM_DELETE_WINDOW", cancel)
         return w, bar, w.winfo_children()[0], perc
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()
     app = PrinterApp()
     app.mainloop()
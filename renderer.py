@@ -0,0 +1,133 @@
+import fitz
+import os
+import queue
+import time
+import hashlib
+import tracing
+from PIL import Image
+from concurrent.futures import ProcessPoolExecutor
+import engine
+
+_open_sources = {}
+_fingerprints = {}
+_written = {}
+
+def fingerprint(path):
+    stat = engine.file_stat(path)
+    fp = _fingerprints.get((path, stat))
+    if fp is None:
+        h = hashlib.sha1()
+        h.update(repr(stat).encode())
+        with open(path, "rb") as f:
+            h.update(f.read(65536))
+            f.seek(max(0, stat[0] - 65536))
+            h.update(f.read(65536))
+        fp = _fingerprints[path, stat] = h.hexdigest()[:20]
+    return fp
+
+class DiskCache:
+    def __init__(self, directory, max_bytes, quality=85):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.quality = quality
+        os.makedirs(directory, exist_ok=True)
+
+    def file(self, path, page_no, rotation, zoom):
+        return os.path.join(self.directory, f"{fingerprint(path)}_{page_no}_{rotation}_{round(zoom * 100)}.jpg")
+
+    def get(self, path, page_no, rotation, zoom):
+        try:
+            file = self.file(path, page_no, rotation, zoom)
+            with Image.open(file) as img: img = img.convert("RGB")
+            os.utime(file)
+        except OSError: return None
+        return img
+
+    def put(self, path, page_no, rotation, zoom, img):
+        try:
+            file = self.file(path, page_no, rotation, zoom)
+            temp = f"{file}.{os.getpid()}.tmp"
+            img.save(temp, "JPEG", quality=self.quality)
+            os.replace(temp, file)
+            size = os.path.getsize(file)
+        except OSError: return
+        _written[self.directory] = _written.get(self.directory, 0) + size
+        if _written[self.directory] > self.max_bytes // 20: self.trim()
+
+    def trim(self):
+        _written[self.directory] = 0
+        files = []
+        for entry in os.scandir(self.directory):
+            try: stat = entry.stat()
+            except OSError: continue
+            files.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in files)
+        for _, size, file in sorted(files):
+            if total <= self.max_bytes: break
+            try: os.remove(file)
+            except OSError: continue
+            total -= size
+
+def render_page(path, page_no, rotation, zoom, disk_cache=None):
+    start = time.perf_counter()
+    img = disk_cache.get(path, page_no, rotation, zoom) if disk_cache else None
+    if img is not None: return img.width, img.height, img.tobytes(), time.perf_counter() - start
+    stat = engine.file_stat(path)
+    opened = _open_sources.get(path)
+    if opened is None or opened[0] != stat:
+        if opened is not None: opened[1].close()
+        opened = _open_sources[path] = (stat, engine.open_source(path))
+    doc, pno = opened[1].locate(page_no)
+    pix = doc.load_page(pno).get_pixmap(matrix=fitz.Matrix(zoom, zoom).prerotate(rotation))
+    if disk_cache: disk_cache.put(path, page_no, rotation, zoom, Image.frombytes("RGB", (pix.width, pix.height), pix.samples))
+    return pix.width, pix.height, pix.samples, time.perf_counter() - start
+
+class ThumbnailRenderer:
+    def __init__(self, workers, disk_cache=None):
+        self.workers = workers
+        self.disk_cache = disk_cache
+        self.pool = None
+        self.jobs = {}
+        self.results = queue.Queue()
+
+    def submit(self, key, path, page_no, rotation, zoom):
+        if key in self.jobs: return
+        if self.pool is None:
+            self.pool = ProcessPoolExecutor(max_workers=self.workers)
+        future = self.pool.submit(render_page, path, page_no, rotation, zoom, self.disk_cache)
+        self.jobs[key] = future
+        future.add_done_callback(lambda f, k=key: self.finished(k, f))
+
+    def finished(self, key, future):
+        if not future.cancelled() and future.exception() is None:
+            tracing.record("render_page", time.perf_counter() - future.result()[3], page=key[0], rotation=key[1], zoom=key[2])
+        self.results.put((key, future))
+
+    def cancel_except(self, keep):
+        for key, future in list(self.jobs.items()):
+            if key not in keep and future.cancel():
+                del self.jobs[key]
+
+    def poll(self):
+        done = []
+        while True:
+            try: key, future = self.results.get_nowait()
+            except queue.Empty: break
+            if self.jobs.get(key) is not future or future.cancelled(): continue
+            del self.jobs[key]
+            try: done.append((key, future.result(), None))
+            except Exception as e: done.append((key, None, e))
+        return done
+
+    def busy(self):
+        return bool(self.jobs)
+
+    def reset(self):
+        for future in self.jobs.values(): future.cancel()
+        self.jobs.clear()
+
+    def shutdown(self):
+        self.reset()
+        if self.pool is not None:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+            self.pool = None
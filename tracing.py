@@ -0,0 +1,101 @@
+import os
+import sys
+import json
+import time
+import threading
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+try: import resource
+except ImportError: resource = None
+
+tracer = None
+
+def peak_rss():
+    if resource is None: return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+class Tracer:
+    def __init__(self, origin=None):
+        self.events = []
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.origin = time.perf_counter() if origin is None else origin
+        self.started = time.strftime("%Y%m%d_%H%M%S")
+        self.pid = os.getpid()
+        if not tracemalloc.is_tracing(): tracemalloc.start()
+
+    def now(self):
+        return (time.perf_counter() - self.origin) * 1e6
+
+    def add(self, event):
+        event.update(pid=self.pid, tid=event.get("tid", threading.get_ident()))
+        with self.lock: self.events.append(event)
+
+    @contextmanager
+    def span(self, name, **args):
+        depth = getattr(self.local, "depth", 0)
+        if not depth: tracemalloc.reset_peak()
+        self.local.depth = depth + 1
+        start = self.now()
+        try: yield args
+        finally:
+            self.local.depth = depth
+            current, peak = tracemalloc.get_traced_memory()
+            args["mem_current"] = current
+            if not depth: args.update(mem_peak=peak, rss_peak=peak_rss())
+            self.add({"name": name, "ph": "X", "ts": start, "dur": self.now() - start, "args": args})
+
+    def record(self, name, start, end=None, **args):
+        end = time.perf_counter() if end is None else end
+        self.add({"name": name, "ph": "X", "ts": (start - self.origin) * 1e6, "dur": (end - start) * 1e6, "args": args})
+
+    def error(self, name, message, **args):
+        self.add({"name": name, "ph": "i", "s": "t", "ts": self.now(), "args": dict(args, error=str(message))})
+
+    def summary(self, events):
+        stats, errors = {}, []
+        for event in events:
+            if event["ph"] == "i":
+                errors.append(f"{event['ts'] / 1e6:10.3f}s  {event['name']}: {event['args']}")
+                continue
+            item = stats.setdefault(event["name"], {"count": 0, "total": 0, "max": 0, "mem_peak": 0, "images": 0, "bytes_in": 0, "bytes_out": 0})
+            item["count"] += 1
+            item["total"] += event["dur"]
+            item["max"] = max(item["max"], event["dur"])
+            args = event["args"]
+            item["mem_peak"] = max(item["mem_peak"], args.get("mem_peak") or 0)
+            for key in ("images", "bytes_in", "bytes_out"): item[key] += args.get(key, 0)
+        lines = [f"rePagePDF trace {self.started}, {len(events)} events, peak RSS {(peak_rss() or 0) / 1048576:.1f} MB", ""]
+        lines.append(f"{'stage':<24}{'count':>8}{'total ms':>12}{'avg ms':>10}{'max ms':>10}{'peak MB':>9}{'images':>8}{'in MB':>9}{'out MB':>9}")
+        for name, item in sorted(stats.items(), key=lambda kv: -kv[1]["total"]):
+            lines.append(f"{name:<24}{item['count']:>8}{item['total'] / 1000:>12.1f}{item['total'] / item['count'] / 1000:>10.1f}{item['max'] / 1000:>10.1f}"
+                         f"{item['mem_peak'] / 1048576:>9.1f}{item['images']:>8}{item['bytes_in'] / 1048576:>9.1f}{item['bytes_out'] / 1048576:>9.1f}")
+        if errors: lines += ["", "errors:"] + errors
+        return "\n".join(lines) + "\n"
+
+    def export(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        with self.lock: events = list(self.events)
+        base = os.path.join(directory, f"trace_{self.started}")
+        with open(base + ".json", "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+        with open(base + ".log", "w", encoding="utf-8") as f: f.write(self.summary(events))
+        return base + ".json"
+
+def enable(origin=None):
+    global tracer
+    if tracer is None: tracer = Tracer(origin)
+    return tracer
+
+def span(name, **args):
+    return tracer.span(name, **args) if tracer else nullcontext(args)
+
+def record(name, start, end=None, **args):
+    if tracer: tracer.record(name, start, end, **args)
+
+def error(name, message, **args):
+    if tracer: tracer.error(name, message, **args)
+
+def export(directory):
+    return tracer.export(directory) if tracer else None